@@ -0,0 +1,319 @@
+"""Seeds a database, drives every route and reports throughput and latency percentiles as JSON.
+
+    python -m benchmarks.loadtest run --requests 500 --concurrency 16 --output results.json
+    python -m benchmarks.loadtest run --mode uvicorn --workers 4 --database-url postgresql://user:pw@localhost/bench
+    python -m benchmarks.loadtest compare results.json --baseline baseline.json
+
+Without ``--database-url`` a throwaway SQLite file is used. ``--mode asgi`` calls the app in process through
+``httpx.ASGITransport``; ``--mode uvicorn`` starts ``uvicorn`` as a subprocess and goes through a real socket.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def _async_url(url: str) -> str:
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+def _percentile(ordered: list[float], fraction: float) -> float:
+    # Nearest rank, so every reported value is a latency that was actually observed.
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def _first_event(client, method: str, url: str, kwargs: dict) -> int:
+    """Reads a Server-Sent Events response up to its first event, then drops the connection."""
+    async with client.stream(method, url, **kwargs) as response:
+        if response.status_code < 400:
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    break
+        return response.status_code
+
+
+async def run_scenario(client, scenario, fixtures, requests: int, concurrency: int, seed: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+    rng = random.Random(seed)
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            method, url, kwargs = await scenario.prepare(client, rng, fixtures)
+            started = time.perf_counter()
+            if scenario.stream:
+                status = await _first_event(client, method, url, kwargs)
+            else:
+                status = (await client.request(method, url, **kwargs)).status_code
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_all(client, scenarios, fixtures, args, stream_client=None) -> dict:
+    results = {}
+    for index, scenario in enumerate(scenarios):
+        scenario_client = stream_client if scenario.stream and stream_client is not None else client
+        if args.warmup:
+            await run_scenario(scenario_client, scenario, fixtures, args.warmup, args.concurrency, args.seed + index)
+        results[scenario.name] = await run_scenario(
+            scenario_client, scenario, fixtures, args.requests, args.concurrency, args.seed + index
+        )
+        print(f"{scenario.name:<40} {results[scenario.name]['throughput_rps']:>9.1f} rps "
+              f"p50 {results[scenario.name]['p50_ms']:>8.2f} ms  p99 {results[scenario.name]['p99_ms']:>8.2f} ms",
+              file=sys.stderr)
+    return results
+
+
+def streaming_asgi_transport(app):
+    """An in-process transport that returns once the headers are sent and disconnects when the response is closed.
+
+    ``httpx.ASGITransport`` waits for the whole body, which an event stream never finishes.
+    """
+    import httpx
+
+    class Body(httpx.AsyncByteStream):
+        def __init__(self, messages: asyncio.Queue, disconnected: asyncio.Event, task: asyncio.Task):
+            self.messages, self.disconnected, self.task = messages, disconnected, task
+
+        async def __aiter__(self):
+            while (message := await self.messages.get()) is not None:
+                yield message.get("body", b"")
+                if not message.get("more_body"):
+                    break
+
+        async def aclose(self):
+            self.disconnected.set()
+            await self.task
+
+    class Transport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            body = await request.aread()
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": request.method,
+                "scheme": request.url.scheme, "path": request.url.path, "raw_path": request.url.raw_path.split(b"?")[0],
+                "query_string": request.url.query, "root_path": "",
+                "headers": [(name.lower(), value) for name, value in request.headers.raw],
+                "client": ("127.0.0.1", 0), "server": (request.url.host, request.url.port or 80),
+            }
+            messages, disconnected, received = asyncio.Queue(), asyncio.Event(), False
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {"type": "http.request", "body": body, "more_body": False}
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def call_app():
+                try:
+                    await app(scope, receive, messages.put)
+                finally:
+                    await messages.put(None)
+
+            task = asyncio.create_task(call_app())
+            start = await messages.get()
+            if start is None:
+                await task
+                raise RuntimeError(f"{request.method} {request.url} sent no response")
+            return httpx.Response(start["status"], headers=start.get("headers", []),
+                                  stream=Body(messages, disconnected, task))
+
+    return Transport()
+
+
+async def drive_asgi(scenarios, fixtures, args) -> dict:
+    import httpx
+    from main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=args.timeout) as client, \
+                httpx.AsyncClient(transport=streaming_asgi_transport(app), base_url="http://bench",
+                                  timeout=args.timeout) as stream_client:
+            return await run_all(client, scenarios, fixtures, args, stream_client)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive_uvicorn(scenarios, fixtures, args) -> dict:
+    import httpx
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=os.environ.copy(),
+    )
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=args.timeout) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    await client.get("/system/pool")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            return await run_all(client, scenarios, fixtures, args)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run(args):
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{Path(tempfile.mkdtemp(prefix='fastapitest-bench-')) / 'bench.db'}"
+        args.reset = True
+    # The app reads its database settings at import time, so they are set before anything from it is imported.
+    os.environ["DB_URL"] = args.database_url
+    os.environ["DB_ASYNC_URL"] = _async_url(args.database_url)
+    # Every scenario runs as one user from one address, which the rate limits would mostly answer with 429.
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+    from benchmarks.scenarios import SCENARIOS
+    from benchmarks.seed import Volumes, seed
+    from db.db_settings import AsyncSessionLocal, async_engine
+    from utils import comment_stats
+
+    unknown = set(args.routes or ()) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}")
+    scenarios = [SCENARIOS[name] for name in (args.routes or SCENARIOS)]
+
+    volumes = Volumes(args.users, args.posts_per_user, args.comments_per_post, args.days, args.seed)
+    fixtures = seed(args.database_url, volumes, reset=args.reset)
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            await comment_stats.backfill(db)
+        await async_engine.dispose()
+        drive = drive_asgi if args.mode == "asgi" else drive_uvicorn
+        return await drive(scenarios, fixtures, args)
+
+    results = asyncio.run(main())
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "database": make_url(args.database_url).get_backend_name(),
+            "volumes": vars(volumes),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "routes": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    print(output)
+
+
+def compare(args) -> int:
+    current = json.loads(Path(args.results).read_text())["routes"]
+    baseline = json.loads(Path(args.baseline).read_text())["routes"]
+    regressions = 0
+    print(f"{'route':<40}{'rps':>10}{'base':>10}{'p95 ms':>10}{'base':>10}  verdict")
+    for name, stats in current.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<40}{stats['throughput_rps']:>10.1f}{'-':>10}{stats['p95_ms']:>10.2f}{'-':>10}  new")
+            continue
+        slower = stats["p95_ms"] > base["p95_ms"] * (1 + args.tolerance)
+        fewer = stats["throughput_rps"] < base["throughput_rps"] * (1 - args.tolerance)
+        more_errors = stats["errors"] > base["errors"]
+        verdict = "REGRESSION" if slower or fewer or more_errors else "ok"
+        regressions += verdict != "ok"
+        print(f"{name:<40}{stats['throughput_rps']:>10.1f}{base['throughput_rps']:>10.1f}"
+              f"{stats['p95_ms']:>10.2f}{base['p95_ms']:>10.2f}  {verdict}")
+    # A route the baseline measured but this run did not may have stopped working, it is not just skipped.
+    for name, base in baseline.items():
+        if name not in current:
+            regressions += 1
+            print(f"{name:<40}{'-':>10}{base['throughput_rps']:>10.1f}{'-':>10}{base['p95_ms']:>10.2f}  MISSING")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test every route of the API.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="seed a database, drive the routes and print JSON results")
+    run_parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    run_parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    run_parser.add_argument("--database-url", default=None,
+                            help="sync SQLAlchemy URL of a database the benchmark may write to, default a temporary SQLite file")
+    run_parser.add_argument("--reset", action="store_true", help="drop and recreate every table first")
+    run_parser.add_argument("--users", type=int, default=50)
+    run_parser.add_argument("--posts-per-user", type=int, default=20)
+    run_parser.add_argument("--comments-per-post", type=int, default=10)
+    run_parser.add_argument("--days", type=int, default=90, help="spread comments over this many past days")
+    run_parser.add_argument("--requests", type=int, default=200, help="measured requests per route")
+    run_parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per route")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--timeout", type=float, default=60)
+    run_parser.add_argument("--seed", type=int, default=42)
+    run_parser.add_argument("--route", dest="routes", action="append", help="only run this route, repeatable")
+    run_parser.add_argument("--output", help="also write the JSON results to this file")
+
+    compare_parser = subparsers.add_parser("compare", help="compare results against a stored baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--baseline", required=True)
+    compare_parser.add_argument("--tolerance", type=float, default=0.10,
+                                help="allowed relative p95 / throughput change before flagging a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""One scenario per route. ``prepare`` may issue untimed setup requests; only the request it returns is measured.
+
+``PUT`` and ``DELETE /users/{user_id}`` are left out: they would change or remove the seeded users the other
+scenarios log in as, and ``POST /users/`` does not return the id a throwaway user would need. The comment stream
+never ends, so a ``stream`` scenario is timed until its first event; the WebSocket feed is not covered.
+"""
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable
+
+import httpx
+
+from benchmarks.seed import PASSWORD, Fixtures
+from utils.auth import create_access_token
+
+Request = tuple[str, str, dict]
+
+
+@dataclass
+class Scenario:
+    name: str
+    prepare: Callable[[httpx.AsyncClient, random.Random, Fixtures], Awaitable[Request]]
+    stream: bool = False
+
+
+def _auth(username: str) -> dict:
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': username})}"}
+
+
+def _user(rng: random.Random, fixtures: Fixtures) -> tuple[int, str, str]:
+    user_id = rng.choice(list(fixtures.users))
+    return (user_id, *fixtures.users[user_id])
+
+
+def _commenter(rng: random.Random, fixtures: Fixtures) -> tuple[int, str, tuple[int, int]]:
+    user_id = rng.choice(list(fixtures.comments))
+    return user_id, fixtures.users[user_id][0], rng.choice(fixtures.comments[user_id])
+
+
+def _post_owner(rng: random.Random, fixtures: Fixtures) -> tuple[int, str, int]:
+    user_id = rng.choice(list(fixtures.posts))
+    return user_id, fixtures.users[user_id][0], rng.choice(fixtures.posts[user_id])
+
+
+async def get_user(client, rng, fixtures):
+    user_id, _, _ = _user(rng, fixtures)
+    return "GET", f"/users/{user_id}", {}
+
+
+async def login(client, rng, fixtures):
+    _, username, email = _user(rng, fixtures)
+    return "POST", "/login/", {"json": {"username": username, "email": email, "password": PASSWORD}}
+
+
+async def create_user(client, rng, fixtures):
+    # Unique across runs against the same database, the route rejects taken usernames.
+    username = f"bench-new-{uuid.uuid4().hex[:12]}"
+    return "POST", "/users/", {"json": {"username": username, "email": f"{username}@example.com", "password": PASSWORD}}
+
+
+async def list_posts(client, rng, fixtures):
+    _, username, _ = _user(rng, fixtures)
+    return "GET", "/posts/", {"params": {"limit": 20}, "headers": _auth(username)}
+
+
+async def get_post(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "GET", f"/posts/{post_id}", {"headers": _auth(username)}
+
+
+async def get_post_full(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "GET", f"/posts/{post_id}/full", {"params": {"limit": 20}, "headers": _auth(username)}
+
+
+async def export_posts(client, rng, fixtures):
+    _, username, _ = _user(rng, fixtures)
+    return "GET", "/posts/export", {"headers": _auth(username)}
+
+
+async def create_post(client, rng, fixtures):
+    _, username, _ = _user(rng, fixtures)
+    return "POST", "/posts/", {"json": {"title": "Benchmark", "content": "Created by the benchmark"},
+                               "headers": _auth(username)}
+
+
+async def update_post(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "PUT", f"/posts/{post_id}", {"json": {"title": f"Updated {rng.random()}"}, "headers": _auth(username)}
+
+
+async def delete_post(client, rng, fixtures):
+    _, username, _ = _user(rng, fixtures)
+    headers = _auth(username)
+    created = await client.post("/posts/", json={"title": "Doomed", "content": ""}, headers=headers)
+    return "DELETE", f"/posts/{created.json()['id']}", {"headers": headers}
+
+
+async def list_comments(client, rng, fixtures):
+    _, username, (_, post_id) = _commenter(rng, fixtures)
+    return "GET", "/comments/", {"params": {"post_id": post_id, "limit": 20}, "headers": _auth(username)}
+
+
+async def get_comment(client, rng, fixtures):
+    _, username, (comment_id, _) = _commenter(rng, fixtures)
+    return "GET", f"/comments/{comment_id}", {"headers": _auth(username)}
+
+
+async def export_comments(client, rng, fixtures):
+    _, username, (_, post_id) = _commenter(rng, fixtures)
+    return "GET", "/comments/export", {"params": {"post_id": post_id}, "headers": _auth(username)}
+
+
+async def create_comment(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "POST", "/comments/", {"json": {"content": "Benchmark comment", "post_id": post_id},
+                                  "headers": _auth(username)}
+
+
+async def create_comments_bulk(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "POST", "/comments/bulk", {"json": {"comments": [{"content": f"Bulk {i}", "post_id": post_id}
+                                                            for i in range(20)]},
+                                      "headers": _auth(username)}
+
+
+async def update_comment(client, rng, fixtures):
+    user_id, username, (comment_id, post_id) = _commenter(rng, fixtures)
+    return "PUT", f"/comments/{comment_id}", {"params": {"post_id": post_id, "author_id": user_id},
+                                              "json": {"content": f"Edited {rng.random()}"},
+                                              "headers": _auth(username)}
+
+
+async def delete_comment(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    headers = _auth(username)
+    created = await client.post("/comments/", json={"content": "Doomed", "post_id": post_id}, headers=headers)
+    return "DELETE", f"/comments/{created.json()['data']['id']}", {"headers": headers}
+
+
+async def list_post_comments(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    return "GET", f"/posts/{post_id}/comments", {"params": {"limit": 20}, "headers": _auth(username)}
+
+
+async def stream_comments(client, rng, fixtures):
+    _, username, post_id = _post_owner(rng, fixtures)
+    # Replays the post's comments from the start, so the first event arrives without waiting for a write.
+    return "GET", f"/posts/{post_id}/comments/stream", {"headers": {**_auth(username), "Last-Event-ID": "0"}}
+
+
+async def search(client, rng, fixtures):
+    _, username, _ = _user(rng, fixtures)
+    return "GET", "/search", {"params": {"q": rng.choice(["benchmark", "post", "comment"]), "limit": 20},
+                              "headers": _auth(username)}
+
+
+async def breakdown(client, rng, fixtures):
+    first, last = date.fromisoformat(fixtures.first_day), date.fromisoformat(fixtures.last_day)
+    start = first + timedelta(days=rng.randrange(max((last - first).days - 30, 1)))
+    return "GET", "/breakdown/", {"params": {"date_from": str(start), "date_to": str(start + timedelta(days=30))}}
+
+
+async def pool_stats(client, rng, fixtures):
+    return "GET", "/system/pool", {}
+
+
+async def auth_cache_stats(client, rng, fixtures):
+    return "GET", "/system/auth-cache", {}
+
+
+async def breakdown_cache_stats(client, rng, fixtures):
+    return "GET", "/system/breakdown-cache", {}
+
+
+async def metrics(client, rng, fixtures):
+    return "GET", "/metrics", {}
+
+
+async def health_live(client, rng, fixtures):
+    return "GET", "/health/live", {}
+
+
+async def health_ready(client, rng, fixtures):
+    return "GET", "/health/ready", {}
+
+
+SCENARIOS = {scenario.name: scenario for scenario in [
+    Scenario("GET /users/{user_id}", get_user),
+    Scenario("POST /login/", login),
+    Scenario("POST /users/", create_user),
+    Scenario("GET /posts/", list_posts),
+    Scenario("GET /posts/{post_id}", get_post),
+    Scenario("GET /posts/{post_id}/full", get_post_full),
+    Scenario("GET /posts/export", export_posts),
+    Scenario("POST /posts/", create_post),
+    Scenario("PUT /posts/{post_id}", update_post),
+    Scenario("DELETE /posts/{post_id}", delete_post),
+    Scenario("GET /comments/", list_comments),
+    Scenario("GET /comments/{comment_id}", get_comment),
+    Scenario("GET /comments/export", export_comments),
+    Scenario("POST /comments/", create_comment),
+    Scenario("POST /comments/bulk", create_comments_bulk),
+    Scenario("PUT /comments/{comment_id}", update_comment),
+    Scenario("DELETE /comments/{comment_id}", delete_comment),
+    Scenario("GET /posts/{post_id}/comments", list_post_comments),
+    Scenario("GET /posts/{post_id}/comments/stream", stream_comments, stream=True),
+    Scenario("GET /breakdown/", breakdown),
+    Scenario("GET /search", search),
+    Scenario("GET /system/pool", pool_stats),
+    Scenario("GET /system/auth-cache", auth_cache_stats),
+    Scenario("GET /system/breakdown-cache", breakdown_cache_stats),
+    Scenario("GET /metrics", metrics),
+    Scenario("GET /health/live", health_live),
+    Scenario("GET /health/ready", health_ready),
+]}
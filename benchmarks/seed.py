@@ -0,0 +1,96 @@
+"""Deterministic benchmark data: users, their posts and comments spread over the last ``days`` days."""
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.future import select
+
+from db.db_settings import Base
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from utils.hashing import pwd_context
+
+PASSWORD = "benchmark"
+CHUNK_SIZE = 5000
+
+
+@dataclass
+class Volumes:
+    users: int = 50
+    posts_per_user: int = 20
+    comments_per_post: int = 10
+    days: int = 90
+    seed: int = 42
+
+
+@dataclass
+class Fixtures:
+    """What the scenarios need to address seeded rows, per user id."""
+    users: dict[int, tuple[str, str]] = field(default_factory=dict)
+    posts: dict[int, list[int]] = field(default_factory=dict)
+    comments: dict[int, list[tuple[int, int]]] = field(default_factory=dict)
+    first_day: str = ""
+    last_day: str = ""
+
+
+def _insert_chunked(conn, table, rows: list[dict]):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        conn.execute(insert(table), rows[start:start + CHUNK_SIZE])
+
+
+def _enable_wal(url: str, engine):
+    if url.startswith("sqlite"):
+        # Readers keep going while a writer commits, closer to how Postgres behaves under load.
+        @event.listens_for(engine, "connect")
+        def set_wal(dbapi_connection, connection_record):
+            dbapi_connection.execute("PRAGMA journal_mode=WAL")
+
+
+def seed(url: str, volumes: Volumes, reset: bool = False) -> Fixtures:
+    """Creates the schema at the sync ``url`` and fills it unless it already holds the benchmark users."""
+    engine = create_engine(url)
+    _enable_wal(url, engine)
+    if reset:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    rng = random.Random(volumes.seed)
+    now = datetime.now().replace(microsecond=0)
+    with engine.begin() as conn:
+        if conn.execute(select(User.id).filter(User.username == "bench-user-0")).first() is None:
+            hashed = pwd_context.hash(PASSWORD)
+            _insert_chunked(conn, User.__table__, [
+                {"username": f"bench-user-{i}", "email": f"bench-user-{i}@example.com", "password": hashed, "active": True}
+                for i in range(volumes.users)
+            ])
+            user_ids = list(conn.execute(select(User.id).filter(User.username.like("bench-user-%"))).scalars())
+            _insert_chunked(conn, Post.__table__, [
+                {"title": f"Post {i} of {owner_id}", "content": "Benchmark post " * 20, "owner_id": owner_id,
+                 "autoreply": False, "autoreply_delay": 0, "autoreply_msg": ""}
+                for owner_id in user_ids for i in range(volumes.posts_per_user)
+            ])
+            post_ids = list(conn.execute(select(Post.id).filter(Post.owner_id.in_(user_ids))).scalars())
+            comments = []
+            for post_id in post_ids:
+                for i in range(volumes.comments_per_post):
+                    created_at = now - timedelta(seconds=rng.randrange(volumes.days * 86400))
+                    comments.append({"content": f"Comment {i}", "post_id": post_id, "author_id": rng.choice(user_ids),
+                                     "is_blocked": rng.random() < 0.05, "created_at": created_at,
+                                     "updated_at": created_at})
+            _insert_chunked(conn, Comment.__table__, comments)
+
+        fixtures = Fixtures(first_day=str((now - timedelta(days=volumes.days)).date()), last_day=str(now.date()))
+        for user_id, username, email in conn.execute(
+            select(User.id, User.username, User.email).filter(User.username.like("bench-user-%"))
+        ):
+            fixtures.users[user_id] = (username, email)
+        for post_id, owner_id in conn.execute(select(Post.id, Post.owner_id).filter(Post.owner_id.in_(fixtures.users))):
+            fixtures.posts.setdefault(owner_id, []).append(post_id)
+        for comment_id, post_id, author_id in conn.execute(
+            select(Comment.id, Comment.post_id, Comment.author_id).filter(Comment.author_id.in_(fixtures.users))
+        ):
+            fixtures.comments.setdefault(author_id, []).append((comment_id, post_id))
+    engine.dispose()
+    return fixtures
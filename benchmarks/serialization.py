@@ -0,0 +1,97 @@
+"""Per-item cost of serializing a ``/comments/`` page, the default FastAPI path against ``utils.serialization``.
+
+    python -m benchmarks.serialization --items 100 --repeat 200
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import create_engine, insert
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+
+import db.models  # noqa: F401 - registers every mapper
+from db.db_settings import Base
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from schemas.comment_schema import CommentScheme, ResponseStatus
+from utils.serialization import columns_for, json_response, row_dicts
+
+
+def _seed(session: Session, items: int):
+    user = User(username="bench", email="bench@example.com", password="x")
+    session.add(user)
+    session.flush()
+    post = Post(title="Bench", content="", owner_id=user.id)
+    session.add(post)
+    session.flush()
+    session.execute(insert(Comment), [
+        {"content": f"Benchmark comment number {i}", "post_id": post.id, "author_id": user.id} for i in range(items)
+    ])
+    session.commit()
+
+
+def _fetch_objects(session: Session) -> list:
+    return [{"status": "success", "data": comment}
+            for comment in session.execute(select(Comment).order_by(Comment.id)).scalars().all()]
+
+
+def _fetch_rows(session: Session) -> list:
+    return [{"status": "success", "data": comment}
+            for comment in row_dicts(session.execute(select(*columns_for(CommentScheme, Comment)).order_by(Comment.id)))]
+
+
+async def _encode_default(content: list, field) -> bytes:
+    # What FastAPI does for a response_model: validate and dump to Python, then json.dumps in JSONResponse.
+    return JSONResponse(await serialize_response(field=field, response_content=content)).body
+
+
+async def _encode_fast(content: list) -> bytes:
+    return json_response(List[ResponseStatus], content).body
+
+
+def _measure(session: Session, fetch, encode, repeat: int) -> tuple[float, float]:
+    async def run():
+        fetching = encoding = 0.0
+        for _ in range(repeat):
+            # A fresh identity map each round, as in a request-scoped session.
+            session.expunge_all()
+            started = time.perf_counter()
+            content = fetch(session)
+            fetched = time.perf_counter()
+            await encode(content)
+            fetching += fetched - started
+            encoding += time.perf_counter() - fetched
+        return fetching, encoding
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    field = create_model_field(name="Response", type_=List[ResponseStatus], mode="serialization")
+    with Session(engine) as session:
+        _seed(session, args.items)
+        default = _measure(session, _fetch_objects, lambda content: _encode_default(content, field), args.repeat)
+        fast = _measure(session, _fetch_rows, _encode_fast, args.repeat)
+
+    per_item = 1e6 / (args.repeat * args.items)
+    print(f"{'us per item':<32}{'fetch':>8}{'encode':>8}{'total':>8}")
+    for name, (fetching, encoding) in (("ORM objects + response_model", default), ("column rows + TypeAdapter", fast)):
+        print(f"{name:<32}{fetching * per_item:>8.2f}{encoding * per_item:>8.2f}{(fetching + encoding) * per_item:>8.2f}")
+    print(f"encode speedup: {default[1] / fast[1]:.1f}x, total speedup: {sum(default) / sum(fast):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,49 @@
+from fastapi.requests import HTTPConnection
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from utils.settings import DB_HOST, DB_USERNAME, DB_PASSWORD, DB_DATABASE, DB_PORT, DB_DRIVER
+from db.pool_metrics import InstrumentedAsyncQueuePool
+from db.replicas import ReplicaRouter, WROTE_KEY
+from utils.settings import DB_HOST, DB_USERNAME, DB_PASSWORD, DB_DATABASE, DB_PORT, DB_DRIVER, DB_ASYNC_DRIVER
+from utils.settings import DB_URL, DB_ASYNC_URL
+from utils.settings import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+from utils.settings import DB_REPLICA_URLS, DB_REPLICA_STICKY_SECONDS, DB_REPLICA_RETRY_SECONDS
 
-DATABASE_URL = f"{DB_DRIVER}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
+DATABASE_URL = DB_URL or f"{DB_DRIVER}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
+ASYNC_DATABASE_URL = DB_ASYNC_URL or f"{DB_ASYNC_DRIVER}://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
 
+# The sync engine is kept for Alembic and command line scripts, the API itself works through async_engine.
 engine = create_engine(DATABASE_URL)
+POOL_OPTIONS = dict(
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
 Base = declarative_base()
 Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+replica_router = ReplicaRouter(
+    DB_REPLICA_URLS, AsyncSessionLocal, DB_REPLICA_STICKY_SECONDS, DB_REPLICA_RETRY_SECONDS, **POOL_OPTIONS
+)
 
 
-def get_db():
-    db = Session()
-    try:
+def client_key(connection: HTTPConnection) -> str:
+    return connection.headers.get("authorization") or (connection.client.host if connection.client else "")
+
+
+async def get_db(connection: HTTPConnection):
+    async with AsyncSessionLocal() as db:
+        yield db
+        if db.sync_session.info.get(WROTE_KEY):
+            replica_router.record_write(client_key(connection))
+
+
+async def get_read_db(connection: HTTPConnection):
+    """Session for read-only routes, on a replica when one is configured and reachable."""
+    async with replica_router.session(client_key(connection)) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, BigInteger
+from sqlalchemy import Column, BigInteger, Integer
 
 
 class PsqlPrimaryKeyMixin:
-    id = Column("id", BigInteger, primary_key=True, autoincrement=True)
+    # SQLite only autoincrements INTEGER PRIMARY KEY columns, the variant keeps local test databases working.
+    id = Column("id", BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
@@ -0,0 +1,3 @@
+# Importing every model registers all of them on Base, so relationships resolve in scripts that only need one.
+from db.models import autoreply_task, comment, comment_daily_stats, post, user  # noqa: F401
+import db.search_index  # noqa: F401,E402 - search columns and FTS tables for create_all
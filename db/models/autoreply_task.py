@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey, TIMESTAMP
+
+from db.db_settings import Base
+from db.mixins import psql_timestamps_mixin, psql_primary_key_mixin
+
+
+class AutoreplyTask(
+    Base,
+    psql_primary_key_mixin.PsqlPrimaryKeyMixin,
+    psql_timestamps_mixin.PsqlTimestampsMixin,
+):
+    __tablename__ = 'autoreply_tasks'
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    due_at = Column(TIMESTAMP, nullable=False, index=True)
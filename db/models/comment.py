@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, Text, Integer, ForeignKey, Boolean, Index, false
 from sqlalchemy.orm import relationship
 
 from db.db_settings import Base
@@ -11,9 +11,16 @@ class Comment(
     psql_timestamps_mixin.PsqlTimestampsMixin,
 ):
     __tablename__ = 'comments'
+    # On Postgres the migrations partition this table by month of created_at, with (id, created_at) as the
+    # primary key there; see utils.comment_partitions. The ORM keeps identifying comments by id alone.
+    __table_args__ = (
+        Index('ix_comments_post_id_author_id_id', 'post_id', 'author_id', 'id'),
+        Index('ix_comments_author_id_id', 'author_id', 'id'),
+        Index('ix_comments_created_at', 'created_at'),
+    )
     content = Column(Text)
     post_id = Column(Integer, ForeignKey("posts.id"))
     author_id = Column(Integer, ForeignKey("users.id"))
-    is_blocked = Column(Boolean, nullable=False, server_default='false')
+    is_blocked = Column(Boolean, nullable=False, server_default=false())
     post = relationship("Post", back_populates="comments")
     author = relationship("User", back_populates="comments")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Date, Integer
+
+from db.db_settings import Base
+
+
+class CommentDailyStats(Base):
+    __tablename__ = 'comment_daily_stats'
+    day = Column(Date, primary_key=True)
+    total_comments = Column(Integer, nullable=False, server_default='0')
+    blocked_comments = Column(Integer, nullable=False, server_default='0')
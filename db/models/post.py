@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Text, String, Integer, ForeignKey, Boolean
+from sqlalchemy import Column, Text, String, Integer, ForeignKey, Boolean, Index, TIMESTAMP, text
 from sqlalchemy.orm import relationship
 from db.db_settings import Base
 from db.mixins import psql_timestamps_mixin, psql_primary_key_mixin
@@ -10,11 +10,18 @@ class Post(
     psql_timestamps_mixin.PsqlTimestampsMixin,
 ):
     __tablename__ = 'posts'
+    __table_args__ = (
+        Index('ix_posts_owner_id_id', 'owner_id', 'id'),
+    )
     title = Column(String, index=True)
     content = Column(Text)
     autoreply = Column(Boolean, default=False)
     autoreply_delay = Column(Integer, default=0)
     autoreply_msg = Column(Text, default="")
     owner_id = Column(Integer, ForeignKey("users.id"))
+    # Maintained by utils.post_counters in the same transaction as the comment writes.
+    comment_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    blocked_comment_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    last_comment_at = Column(TIMESTAMP, nullable=True)
     owner = relationship("User", back_populates="posts")
     comments = relationship("Comment", back_populates="post")
@@ -0,0 +1,87 @@
+import logging
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from utils.settings import DB_POOL_SLOW_CHECKOUT_MS
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics:
+    """Checkout counters of one engine's pool in this process."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_checkouts = 0
+        self.overflow_checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.checked_out_peak = 0
+
+    def record_checkout(self, pool, waited: float):
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self.checked_out_peak = max(self.checked_out_peak, pool.checkedout())
+        if pool.overflow() > 0:
+            self.overflow_checkouts += 1
+        if waited * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+            self.slow_checkouts += 1
+            logger.warning(
+                "Waited %.1f ms for a DB connection (checked out %s, size %s, overflow %s)",
+                waited * 1000, pool.checkedout(), pool.size(), max(pool.overflow(), 0),
+            )
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            # QueuePool counts overflow from -size, only positive values are connections beyond pool_size.
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "slow_checkouts": self.slow_checkouts,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": self.wait_total * 1000 / self.checkouts if self.checkouts else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+            "checked_out_peak": self.checked_out_peak,
+        }
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that reports how long each checkout waited, timeouts included.
+
+    Each pool keeps its own ``metrics``, so the primary and every replica are reported separately. They carry over
+    when the engine recreates the pool, e.g. on ``dispose()``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def snapshot(self) -> dict:
+        return self.metrics.snapshot(self)
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            logger.error(
+                "Timed out waiting for a DB connection (checked out %s, size %s, overflow %s)",
+                self.checkedout(), self.size(), max(self.overflow(), 0),
+            )
+            raise
+        self.metrics.record_checkout(self, time.perf_counter() - started)
+        return connection
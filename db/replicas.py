@@ -0,0 +1,106 @@
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session as OrmSession
+
+logger = logging.getLogger(__name__)
+
+WROTE_KEY = "wrote"
+REPLICA_KEY = "replica"
+
+
+class ReplicaRouter:
+    """Hands out read-only sessions on replicas, falling back to the primary.
+
+    A client that wrote through the primary within the last ``sticky_seconds`` keeps reading from the
+    primary, so it sees its own writes despite replication lag. A replica that fails to connect is
+    skipped for ``retry_seconds``; one whose pool has no free connection is only skipped for that read.
+    Both are tracked per worker process.
+    """
+
+    def __init__(self, urls: list[str], primary: async_sessionmaker, sticky_seconds: float = 5,
+                 retry_seconds: float = 30, max_tracked_clients: int = 10000, **engine_options):
+        self.primary = primary
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self.max_tracked_clients = max_tracked_clients
+        self.engines = [create_async_engine(url, **engine_options) for url in urls]
+        self._sessions = [
+            async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+            for engine in self.engines
+        ]
+        self._order = itertools.cycle(range(len(self.engines)))
+        self._down_until: dict[int, float] = {}
+        self._recent_writers: dict[str, float] = {}
+
+    def record_write(self, client: str):
+        now = time.monotonic()
+        if len(self._recent_writers) >= self.max_tracked_clients:
+            self._recent_writers = {key: until for key, until in self._recent_writers.items() if until > now}
+        self._recent_writers[client] = now + self.sticky_seconds
+
+    def wrote_recently(self, client: str) -> bool:
+        until = self._recent_writers.get(client)
+        return until is not None and until > time.monotonic()
+
+    def _healthy_replicas(self) -> list[int]:
+        if not self.engines:
+            return []
+        now = time.monotonic()
+        start = next(self._order)
+        order = [(start + offset) % len(self.engines) for offset in range(len(self.engines))]
+        return [index for index in order if self._down_until.get(index, 0) <= now]
+
+    @asynccontextmanager
+    async def session(self, client: str) -> AsyncIterator[AsyncSession]:
+        if not self.wrote_recently(client):
+            for index in self._healthy_replicas():
+                db = self._sessions[index]()
+                db.sync_session.info[REPLICA_KEY] = True
+                try:
+                    # Connect eagerly so an unreachable replica is detected before the route runs.
+                    await db.connection()
+                except PoolTimeoutError:
+                    # Busy rather than down: only this read goes elsewhere.
+                    logger.warning("Read replica %s has no free connection, reading elsewhere", index)
+                    await db.close()
+                    continue
+                except (SQLAlchemyError, OSError, TimeoutError):
+                    logger.warning("Read replica %s is unavailable, skipping it for %ss", index, self.retry_seconds)
+                    self._down_until[index] = time.monotonic() + self.retry_seconds
+                    await db.close()
+                    continue
+                try:
+                    yield db
+                finally:
+                    await db.close()
+                return
+
+        async with self.primary() as db:
+            yield db
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def is_replica(db: AsyncSession) -> bool:
+    """Whether ``db`` came from a replica, whose reads may lag behind the primary."""
+    return bool(db.sync_session.info.get(REPLICA_KEY))
+
+
+@event.listens_for(OrmSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(OrmSession, "do_orm_execute")
+def _mark_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
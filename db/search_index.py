@@ -0,0 +1,59 @@
+"""Full-text search structures, kept up to date by the database on every write.
+
+Postgres gets a stored generated ``search_vector`` column with a GIN index on ``posts`` and ``comments``.
+SQLite, used by local tests, gets external-content FTS5 tables synced by triggers. Neither is mapped on the
+models, so ORM queries never load them; they are attached to ``create_all`` here and created by a migration
+on Postgres.
+"""
+from sqlalchemy import DDL, event
+
+from db.models.comment import Comment
+from db.models.post import Post
+
+POST_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+COMMENT_VECTOR = "to_tsvector('english', coalesce(content, ''))"
+
+POSTGRES = {
+    Post.__table__: [
+        f"ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({POST_VECTOR}) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)",
+    ],
+    Comment.__table__: [
+        f"ALTER TABLE comments ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({COMMENT_VECTOR}) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_comments_search_vector ON comments USING gin (search_vector)",
+    ],
+}
+
+
+def _sqlite_fts(table: str, columns: list[str]) -> list[str]:
+    listed = ", ".join(columns)
+    new = ", ".join(f"new.{column}" for column in columns)
+    old = ", ".join(f"old.{column}" for column in columns)
+    remove = f"INSERT INTO {table}_fts({table}_fts, rowid, {listed}) VALUES ('delete', old.id, {old});"
+    add = f"INSERT INTO {table}_fts(rowid, {listed}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({listed}, content='{table}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN {remove} END",
+        # Only text edits reindex, counter and flag updates leave the FTS table alone.
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {listed} ON {table} BEGIN {remove} {add} END",
+    ]
+
+
+SQLITE = {
+    Post.__table__: _sqlite_fts("posts", ["title", "content"]),
+    Comment.__table__: _sqlite_fts("comments", ["content"]),
+}
+
+for table, statements in POSTGRES.items():
+    for statement in statements:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+for table, statements in SQLITE.items():
+    for statement in statements:
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    # Dropping the content table drops its triggers but not the FTS table.
+    event.listen(table, "before_drop", DDL(f"DROP TABLE IF EXISTS {table.name}_fts").execute_if(dialect="sqlite"))
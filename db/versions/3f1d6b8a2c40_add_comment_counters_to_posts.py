@@ -0,0 +1,46 @@
+"""add comment counters to posts
+
+Revision ID: 3f1d6b8a2c40
+Revises: 9a4e61c3b7d2
+Create Date: 2026-10-18 18:02:11.514302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1d6b8a2c40'
+down_revision: Union[str, None] = '9a4e61c3b7d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('posts', sa.Column('blocked_comment_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('posts', sa.Column('last_comment_at', sa.TIMESTAMP(), nullable=True))
+    # Comments written by the previous API version after this point are not counted,
+    # run `python -m utils.post_counters backfill` once the new version is deployed.
+    op.execute("""
+        UPDATE posts
+        SET comment_count = counts.total,
+            blocked_comment_count = counts.blocked,
+            last_comment_at = counts.latest,
+            updated_at = now()
+        FROM (
+            SELECT post_id, count(*) AS total, count(*) FILTER (WHERE is_blocked) AS blocked,
+                   max(created_at) AS latest
+            FROM comments
+            GROUP BY post_id
+        ) AS counts
+        WHERE posts.id = counts.post_id
+    """)
+
+
+def downgrade():
+    op.drop_column('posts', 'last_comment_at')
+    op.drop_column('posts', 'blocked_comment_count')
+    op.drop_column('posts', 'comment_count')
@@ -0,0 +1,33 @@
+"""add comment daily stats table
+
+Revision ID: 5b0d2c7e91af
+Revises: e278f048c2e4
+Create Date: 2026-10-18 11:40:27.108934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b0d2c7e91af'
+down_revision: Union[str, None] = 'e278f048c2e4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    # Filled incrementally by the API, run `python -m utils.comment_stats backfill` once after upgrading.
+    op.create_table(
+        'comment_daily_stats',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('total_comments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('blocked_comments', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade():
+    op.drop_table('comment_daily_stats')
@@ -0,0 +1,41 @@
+"""add full text search columns
+
+Revision ID: 7c5e2a9d4b18
+Revises: 3f1d6b8a2c40
+Create Date: 2026-10-18 18:40:52.337016
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c5e2a9d4b18'
+down_revision: Union[str, None] = '3f1d6b8a2c40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VECTORS = {
+    'posts': "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+             "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+    'comments': "to_tsvector('english', coalesce(content, ''))",
+}
+
+
+def upgrade():
+    # Adding a stored generated column rewrites the table under an exclusive lock, plan it for a quiet moment.
+    for table, vector in VECTORS.items():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED")
+    with op.get_context().autocommit_block():
+        for table in VECTORS:
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for table in VECTORS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_search_vector")
+    for table in VECTORS:
+        op.drop_column(table, 'search_vector')
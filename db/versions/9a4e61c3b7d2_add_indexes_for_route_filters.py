@@ -0,0 +1,42 @@
+"""add indexes for route filters
+
+Revision ID: 9a4e61c3b7d2
+Revises: 5b0d2c7e91af
+Create Date: 2026-10-18 12:58:44.302117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e61c3b7d2'
+down_revision: Union[str, None] = '5b0d2c7e91af'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # read_comments: post_id + author_id filter, ordered and keyset-paged by id
+    ('ix_comments_post_id_author_id_id', 'comments', ['post_id', 'author_id', 'id']),
+    # comments of a user, FK checks when a user is deleted
+    ('ix_comments_author_id_id', 'comments', ['author_id', 'id']),
+    # /breakdown/ created_at range
+    ('ix_comments_created_at', 'comments', ['created_at']),
+    # read_posts: owner_id filter, ordered and keyset-paged by id
+    ('ix_posts_owner_id_id', 'posts', ['owner_id', 'id']),
+]
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and does not lock out writes on a live database.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
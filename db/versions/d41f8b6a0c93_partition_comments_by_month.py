@@ -0,0 +1,92 @@
+"""partition comments by month
+
+Revision ID: d41f8b6a0c93
+Revises: 7c5e2a9d4b18
+Create Date: 2026-10-18 19:21:37.804416
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f8b6a0c93'
+down_revision: Union[str, None] = '7c5e2a9d4b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Partitions for this many months after the current one are created up front, like COMMENTS_PARTITIONS_AHEAD.
+MONTHS_AHEAD = 3
+COLUMNS = "id, created_at, updated_at, content, post_id, author_id, is_blocked"
+INDEXES = [
+    ('ix_comments_post_id_author_id_id', 'btree (post_id, author_id, id)'),
+    ('ix_comments_author_id_id', 'btree (author_id, id)'),
+    ('ix_comments_created_at', 'btree (created_at)'),
+    ('ix_comments_search_vector', 'gin (search_vector)'),
+]
+
+
+def _table(name, primary_key, partitioned):
+    return f"""
+        CREATE TABLE {name} (
+            id bigint NOT NULL DEFAULT nextval('comments_id_seq'),
+            created_at timestamp NOT NULL DEFAULT now(),
+            updated_at timestamp NOT NULL DEFAULT now(),
+            content text,
+            post_id integer NOT NULL CONSTRAINT comments_post_id_fkey REFERENCES posts (id),
+            author_id integer NOT NULL CONSTRAINT comments_author_id_fkey REFERENCES users (id),
+            is_blocked boolean NOT NULL DEFAULT false,
+            search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED,
+            CONSTRAINT comments_pkey PRIMARY KEY ({primary_key})
+        ){' PARTITION BY RANGE (created_at)' if partitioned else ''}
+    """
+
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _rename_old(table):
+    op.execute(f"ALTER TABLE comments RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT comments_pkey TO {table}_pkey")
+    for name, _ in INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_old")
+
+
+def _move_from(table):
+    op.execute(f"INSERT INTO comments ({COLUMNS}) SELECT {COLUMNS} FROM {table}")
+    op.execute("ALTER SEQUENCE comments_id_seq OWNED BY comments.id")
+    op.execute(f"DROP TABLE {table}")
+    for name, definition in INDEXES:
+        op.execute(f"CREATE INDEX {name} ON comments USING {definition}")
+
+
+def upgrade():
+    # Copies every comment under an exclusive lock on comments; run it in a maintenance window. Primary keys on
+    # a partitioned table must contain the partition key, so the key becomes (id, created_at).
+    _rename_old('comments_unpartitioned')
+    op.execute(_table('comments', 'id, created_at', partitioned=True))
+
+    oldest = op.get_bind().execute(sa.text("SELECT min(created_at) FROM comments_unpartitioned")).scalar()
+    month = (oldest or datetime.now()).date().replace(day=1)
+    last = date.today().replace(day=1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE comments_y{month.year:04d}m{month.month:02d} PARTITION OF comments "
+            f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+        )
+        month = _next_month(month)
+    op.execute("CREATE TABLE comments_default PARTITION OF comments DEFAULT")
+
+    _move_from('comments_unpartitioned')
+
+
+def downgrade():
+    _rename_old('comments_partitioned')
+    op.execute(_table('comments', 'id', partitioned=False))
+    _move_from('comments_partitioned')
@@ -0,0 +1,36 @@
+"""add autoreply tasks table
+
+Revision ID: e278f048c2e4
+Revises: 8dcea9dde53d
+Create Date: 2026-10-18 10:12:04.511203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e278f048c2e4'
+down_revision: Union[str, None] = '8dcea9dde53d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    op.create_table(
+        'autoreply_tasks',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey('posts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('due_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_autoreply_tasks_due_at', 'autoreply_tasks', ['due_at'])
+
+
+def downgrade():
+    op.drop_index('ix_autoreply_tasks_due_at', table_name='autoreply_tasks')
+    op.drop_table('autoreply_tasks')
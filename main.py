@@ -1,17 +1,56 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-import uvicorn
 from routes.user import router as user_router
 from routes.post import router as post_router
 from routes.comments import router as comment_router
+from routes.comment_feed import router as comment_feed_router
+from routes.breakdown import router as breakdown_router
+from routes.search import router as search_router
+from routes.system import router as system_router
+from routes.metrics import router as metrics_router
+from routes.health import router as health_router
+from utils.autoreply_scheduler import autoreply_scheduler
+from utils.lifecycle import drain, warm_up
+from utils.comment_partitions import partition_maintainer
+from utils.notifications import notification_hub
+from utils.hashing import hashing_service
+from utils.moderation import moderation_service
+from db.db_settings import replica_router
+from utils.metrics import MetricsMiddleware, metrics
+from utils.server import run
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await metrics.start()
+    await notification_hub.start()
+    await autoreply_scheduler.start()
+    await partition_maintainer.start()
+    await warm_up()
+    yield
+    await drain()
+    await partition_maintainer.stop()
+    await notification_hub.stop()
+    await replica_router.dispose()
+    hashing_service.shutdown()
+    moderation_service.shutdown()
+    await metrics.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(user_router)
 app.include_router(post_router)
 app.include_router(comment_router)
+app.include_router(comment_feed_router)
+app.include_router(breakdown_router)
+app.include_router(search_router)
+app.include_router(system_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
 
 
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8081, reload=True, log_level="debug")
+    run()
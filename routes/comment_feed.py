@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, WebSocket, WebSocketException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from db.db_settings import get_db, get_read_db
+from db.models.comment import Comment
+from db.models.user import User
+from routes.post import get_post_or_404
+from schemas.comment_schema import CommentScheme
+from utils.auth import get_current_active_user, get_websocket_user
+from utils.comment_feed import FeedEvent, Subscription, comment_feed
+from utils.etag import not_modified, set_etag
+from utils.pagination import paginate, set_next_cursor
+from utils.serialization import columns_for, json_response, row_dicts
+
+router = APIRouter(prefix="/posts", tags=["comments"])
+
+logger = logging.getLogger(__name__)
+
+# How long EventSource clients wait before reconnecting, e.g. after a worker shut down.
+SSE_RETRY_MS = 2000
+
+
+def sse_message(event: FeedEvent | None) -> str:
+    if event is None:
+        return ": ping\n\n"
+    lines = f"id: {event.id}\n" if event.id is not None else ""
+    return f"{lines}event: {event.kind}\ndata: {event.data}\n\n"
+
+
+@router.get("/{post_id}/comments", response_model=List[CommentScheme])
+async def read_post_comments(post_id: int, request: Request, limit: int = 100, cursor: Optional[str] = None,
+                             db: AsyncSession = Depends(get_read_db),
+                             current_user: User = Depends(get_current_active_user)):
+    """Every visible comment on the post, whoever wrote it; where streams send clients after a ``resync`` event."""
+    await get_post_or_404(db, post_id, current_user.id)
+    query = select(*columns_for(CommentScheme, Comment), Comment.updated_at)
+    query = query.filter(Comment.post_id == post_id, Comment.is_blocked.is_(False))
+    query = paginate(query, Comment.id, cursor, 0, limit)
+    unchanged = await not_modified(request, db, query, Comment.id, Comment.updated_at)
+    if unchanged is not None:
+        return unchanged
+    comments = (await db.execute(query)).all()
+    response = json_response(List[CommentScheme], row_dicts(comments))
+    set_next_cursor(response, comments, limit)
+    set_etag(response, comments)
+    return response
+
+
+async def sse_stream(post_id: int, last_id: Optional[int]):
+    async with comment_feed.subscribe(post_id) as subscription:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        async for event in comment_feed.events(subscription, last_id):
+            yield sse_message(event)
+
+
+@router.get("/{post_id}/comments/stream")
+async def stream_comments(post_id: int, last_event_id: Optional[int] = Header(None),
+                          db: AsyncSession = Depends(get_read_db),
+                          current_user: User = Depends(get_current_active_user)):
+    """New comments on the post as Server-Sent Events, after ``Last-Event-ID`` when the client reconnects."""
+    await get_post_or_404(db, post_id, current_user.id)
+    return StreamingResponse(sse_stream(post_id, last_event_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+async def send_events(websocket: WebSocket, subscription: Subscription, last_id: Optional[int]):
+    async for event in comment_feed.events(subscription, last_id):
+        if event is not None:
+            # The data is already JSON, encoded once for every subscriber.
+            await websocket.send_text(f'{{"event": "{event.kind}", "id": {event.id or "null"}, "data": {event.data}}}')
+
+
+async def wait_for_disconnect(websocket: WebSocket):
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@router.websocket("/{post_id}/comments/ws")
+async def comments_websocket(websocket: WebSocket, post_id: int, last_id: Optional[int] = None,
+                             db: AsyncSession = Depends(get_db), current_user: User = Depends(get_websocket_user)):
+    """The WebSocket counterpart of ``/comments/stream``; reconnecting clients pass ``?last_id=``."""
+    try:
+        await get_post_or_404(db, post_id, current_user.id)
+    except HTTPException as error:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=error.detail)
+    # The session would otherwise hold its connection for as long as the socket is open.
+    await db.close()
+
+    await websocket.accept()
+    async with comment_feed.subscribe(post_id) as subscription:
+        sender = asyncio.create_task(send_events(websocket, subscription, last_id))
+        receiver = asyncio.create_task(wait_for_disconnect(websocket))
+        done, pending = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if receiver in done:
+        return
+    error = sender.exception()
+    if error is not None:
+        logger.warning("Comment feed of post %s failed", post_id, exc_info=error)
+    # Without an error the feed was closed because the worker is shutting down.
+    await websocket.close(code=status.WS_1011_INTERNAL_ERROR if error else status.WS_1012_SERVICE_RESTART)
@@ -1,65 +1,164 @@
-import time
-from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
-from sqlalchemy.orm import Session
-from db.db_settings import get_db
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from db.db_settings import client_key, get_db, get_read_db, replica_router
 from db.models.comment import Comment
 from db.models.post import Post
 from db.models.user import User
-from schemas.comment_schema import CommentCreate, CommentUpdate, ResponseStatus, DailyCommentSummary
+from schemas.comment_schema import CommentCreate, CommentBulkCreate, CommentUpdate, CommentScheme, ResponseStatus
 from utils.auth import get_current_active_user
+from utils.autoreply_scheduler import autoreply_scheduler
+from utils.comment_coalescer import comment_coalescer
+from utils.concurrency_limit import ConcurrencyLimit
+from utils.rate_limit import write_limit
+from utils.etag import not_modified, set_etag
+from utils import comment_stats
+from utils.export import ndjson_response
+from utils.moderation import moderation_service
+from utils.pagination import paginate, set_next_cursor
+from utils.serialization import columns_for, json_response, row_dicts
+from utils.settings import COMMENT_COALESCING, COMMENT_COALESCE_MAX_BATCH, WRITE_CONCURRENCY
 
 router = APIRouter()
 
 
 @router.get("/comments/", response_model=List[ResponseStatus])
-async def read_comments(post_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db),
-                        current_user: User = Depends(get_current_active_user)):
-    result = db.query(Comment).filter(Comment.post_id == post_id, Comment.author_id == current_user.id).offset(skip).limit(limit)
-    comments = result.all()
-    return [{"status": "success", "data": comment} for comment in comments]
+async def read_comments(post_id: int, request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                        db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    query = select(*columns_for(CommentScheme, Comment), Comment.updated_at)
+    query = paginate(query.filter(Comment.post_id == post_id, Comment.author_id == current_user.id),
+                     Comment.id, cursor, skip, limit)
+    unchanged = await not_modified(request, db, query, Comment.id, Comment.updated_at)
+    if unchanged is not None:
+        return unchanged
+    comments = (await db.execute(query)).all()
+    response = json_response(List[ResponseStatus], [{"status": "success", "data": comment} for comment in row_dicts(comments)])
+    set_next_cursor(response, comments, limit)
+    set_etag(response, comments)
+    return response
+
+
+@router.get("/comments/export")
+async def export_comments(post_id: int, request: Request, current_user: User = Depends(get_current_active_user)):
+    query = select(Comment).filter(Comment.post_id == post_id, Comment.author_id == current_user.id).order_by(Comment.id)
+    return ndjson_response(query, CommentScheme, client_key(request))
 
 
 @router.get("/comments/{comment_id}", response_model=ResponseStatus)
-async def read_comment(comment_id: int, db: Session = Depends(get_db),
+async def read_comment(comment_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db),
                        current_user: User = Depends(get_current_active_user)):
-    comment = db.query(Comment).filter(Comment.id == comment_id, Comment.author_id == current_user.id).first()
+    query = select(Comment).filter(Comment.id == comment_id, Comment.author_id == current_user.id)
+    unchanged = await not_modified(request, db, query, Comment.id, Comment.updated_at)
+    if unchanged is not None:
+        return unchanged
+    comment = (await db.execute(query)).scalars().first()
+    if comment is not None:
+        set_etag(response, [comment])
     return {"status": "success", "data": comment}
 
 
-@router.post("/comments/", response_model=ResponseStatus, status_code=status.HTTP_201_CREATED)
+# Coalesced inserts wait for their batch without holding a connection, so a whole batch may be in flight at once.
+create_comment_limit = ConcurrencyLimit(
+    limit=max(WRITE_CONCURRENCY, COMMENT_COALESCE_MAX_BATCH) if COMMENT_COALESCING else WRITE_CONCURRENCY
+)
+
+
+@router.post("/comments/", response_model=ResponseStatus, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(write_limit), Depends(create_comment_limit)])
 async def create_comment(
     comment: CommentCreate,
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    db_post = db.query(Post).filter(Post.id == comment.post_id).first()
+    if COMMENT_COALESCING:
+        # No connection is held while the comment is moderated and waits for its batch; a missing post fails the
+        # batch insert's foreign key instead of a lookup here.
+        is_blocked = await moderation_service.is_blocked(comment.content)
+        try:
+            new_comment = await comment_coalescer.insert(
+                {**comment.dict(), "author_id": current_user.id, "is_blocked": is_blocked}
+            )
+        except IntegrityError:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        replica_router.record_write(client_key(request))
+        return {"status": "success", "data": new_comment}
+
+    result = await db.execute(select(Post).filter(Post.id == comment.post_id))
+    db_post = result.scalars().first()
     if not db_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
-    new_comment = Comment(**comment.dict(), author_id=current_user.id)
+    is_blocked = await moderation_service.is_blocked(comment.content)
+    new_comment = Comment(**comment.dict(), author_id=current_user.id, is_blocked=is_blocked)
     db.add(new_comment)
-    db.commit()
-    db.refresh(new_comment)
+    await db.flush()
+    await comment_stats.record_comment_created(db, new_comment)
+    autoreply = autoreply_scheduler.schedule(db, db_post) if db_post.autoreply else None
+    await db.commit()
+    await db.refresh(new_comment)
 
-    if db_post.autoreply:
-        background_tasks.add_task(create_autoreply_comment, db_post.id, db)
+    if autoreply is not None:
+        autoreply_scheduler.notify(autoreply.due_at)
 
     return {"status": "success", "data": new_comment}
 
 
-@router.put("/comments/{comment_id}", response_model=ResponseStatus)
+@router.post("/comments/bulk", response_model=List[ResponseStatus], status_code=status.HTTP_200_OK,
+             dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
+async def create_comments_bulk(
+    payload: CommentBulkCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    result = await db.execute(select(Post).filter(Post.id.in_({comment.post_id for comment in payload.comments})))
+    posts = {post.id: post for post in result.scalars().all()}
+
+    accepted = [comment for comment in payload.comments if comment.post_id in posts]
+    flags = await moderation_service.check([comment.content for comment in accepted])
+    rows = [
+        {**comment.dict(), "author_id": current_user.id, "is_blocked": is_blocked}
+        for comment, is_blocked in zip(accepted, flags)
+    ]
+    created = []
+    if rows:
+        # One multi-row INSERT ... RETURNING, rows come back in the order they were sent.
+        result = await db.scalars(insert(Comment).returning(Comment, sort_by_parameter_order=True), rows)
+        created = result.all()
+        await comment_stats.record_comments_created(db, created)
+
+    autoreplies = [
+        autoreply_scheduler.schedule(db, posts[post_id])
+        for post_id in sorted({comment.post_id for comment in created}) if posts[post_id].autoreply
+    ]
+    await db.commit()
+
+    for autoreply in autoreplies:
+        autoreply_scheduler.notify(autoreply.due_at)
+
+    created_comments = iter(created)
+    return [
+        {"status": "success", "data": next(created_comments)} if comment.post_id in posts
+        else {"status": "error", "detail": "Post not found"}
+        for comment in payload.comments
+    ]
+
+
+@router.put("/comments/{comment_id}", response_model=ResponseStatus,
+            dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
 async def update_comment(comment_id: int, comment: CommentUpdate, post_id: int = Query(...),
-                         author_id: int = Query(...), db: Session = Depends(get_db),
+                         author_id: int = Query(...), db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(get_current_active_user)):
-    db_comment = db.query(Comment).filter(
+    result = await db.execute(select(Comment).filter(
         Comment.id == comment_id,
         Comment.post_id == post_id,
         Comment.author_id == author_id,
         Comment.author_id == current_user.id
-    ).first()
+    ))
+    db_comment = result.scalars().first()
 
     if db_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
@@ -67,72 +166,26 @@ async def update_comment(comment_id: int, comment: CommentUpdate, post_id: int =
     for key, value in comment.dict(exclude_unset=True).items():
         setattr(db_comment, key, value)
 
-    db.commit()
-    db.refresh(db_comment)
+    if "content" in comment.model_fields_set:
+        is_blocked = await moderation_service.is_blocked(db_comment.content)
+        if is_blocked != db_comment.is_blocked:
+            db_comment.is_blocked = is_blocked
+            await comment_stats.record_comment_block_changed(db, db_comment)
+
+    await db.commit()
+    await db.refresh(db_comment)
     return {"status": "success", "data": db_comment}
 
 
-@router.delete("/comments/{comment_id}")
-async def delete_comment(comment_id: int, db: Session = Depends(get_db),
+@router.delete("/comments/{comment_id}", dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
+async def delete_comment(comment_id: int, db: AsyncSession = Depends(get_db),
                          current_user: User = Depends(get_current_active_user)):
-    db_comment = db.query(Comment).filter(Comment.id == comment_id, Comment.author_id == current_user.id).first()
-    db.delete(db_comment)
-    db.commit()
-    return {"status": "success", "detail": "Comment deleted successfully"}
-
-
-def create_autoreply_comment(post_id: int, db: Session):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-
-    if not db_post:
-        return
-
-    autoreply_comment = Comment(content=db_post.autoreply_msg, post_id=post_id, author_id=db_post.owner_id)
-    time.sleep(db_post.autoreply_delay)
-    db.add(autoreply_comment)
-    db.commit()
-    db.refresh(autoreply_comment)
-    print(f"Автоматична відповідь створена для поста ID {post_id}: {db_post.autoreply_msg}")
-
+    result = await db.execute(select(Comment).filter(Comment.id == comment_id, Comment.author_id == current_user.id))
+    db_comment = result.scalars().first()
+    if db_comment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
 
-@router.get("/breakdown/", response_model=List[dict])
-async def breakdown(
-    date_from: str,
-    date_to: str,
-    db: Session = Depends(get_db)
-):
-    try:
-        start_date = datetime.strptime(date_from, "%Y-%m-%d")
-        end_date = datetime.strptime(date_to, "%Y-%m-%d")
-        print(start_date, end_date)
-    except ValueError:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format. Use YYYY-MM-DD.")
-
-    results = (
-        db.query(
-            Comment.created_at,
-            Comment.is_blocked,
-        )
-        .filter(Comment.created_at >= start_date, Comment.created_at <= end_date)
-        .all()
-    )
-    daily_summary = {}
-
-    for created_at, is_blocked in results:
-        day = created_at.date()
-        if day not in daily_summary:
-            daily_summary[day] = {"total_comments": 0, "blocked_comments": 0}
-
-        daily_summary[day]["total_comments"] += 1
-        if is_blocked:
-            daily_summary[day]["blocked_comments"] += 1
-
-    # Format the response
-    return [
-        {
-            "date": str(day),
-            "total_comments": data["total_comments"],
-            "blocked_comments": data["blocked_comments"]
-        }
-        for day, data in daily_summary.items()
-    ]
+    await comment_stats.record_comment_deleted(db, db_comment)
+    await db.delete(db_comment)
+    await db.commit()
+    return {"status": "success", "detail": "Comment deleted successfully"}
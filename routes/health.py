@@ -0,0 +1,26 @@
+import asyncio
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from db.db_settings import async_engine
+from utils.lifecycle import ping, server_state
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+READY_CHECK_TIMEOUT = 2
+
+
+@router.get("/live")
+async def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def ready():
+    if not server_state.ready:
+        detail = "draining" if server_state.draining else "starting"
+        return JSONResponse({"status": detail}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    try:
+        await asyncio.wait_for(ping(async_engine), READY_CHECK_TIMEOUT)
+    except Exception:
+        return JSONResponse({"status": "database unavailable"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return {"status": "ready"}
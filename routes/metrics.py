@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from utils.metrics import CONTENT_TYPE, metrics
+
+router = APIRouter(tags=["system"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
@@ -1,61 +1,100 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from db.models.post import Post
 from db.models.user import User
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from schemas.post_schema import PostCreate, PostUpdate, PostScheme
-from db.db_settings import get_db
+from sqlalchemy.orm import selectinload
+from db.models.comment import Comment
+from schemas.post_schema import PostCreate, PostUpdate, PostScheme, PostDetailScheme
+from db.db_settings import client_key, get_db, get_read_db
 from utils.auth import get_current_active_user
+from utils.concurrency_limit import ConcurrencyLimit
+from utils.rate_limit import write_limit
+from utils.etag import not_modified, set_etag
+from utils.export import ndjson_response
+from utils.pagination import paginate, set_next_cursor
+from utils.serialization import columns_for, json_response, row_dicts
 
 router = APIRouter(prefix="/posts", tags=["posts"])
 
 
 @router.get("/", response_model=List[PostScheme])
-async def read_posts(skip: int = 0, limit: int = 10, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    posts = db.query(Post).filter(Post.owner_id == current_user.id).offset(skip).limit(limit).all()
-    return posts
+async def read_posts(request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None,
+                     db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    query = select(*columns_for(PostScheme, Post), Post.updated_at).filter(Post.owner_id == current_user.id)
+    query = paginate(query, Post.id, cursor, skip, limit)
+    unchanged = await not_modified(request, db, query, Post.id, Post.updated_at)
+    if unchanged is not None:
+        return unchanged
+    posts = (await db.execute(query)).all()
+    response = json_response(List[PostScheme], row_dicts(posts))
+    set_next_cursor(response, posts, limit)
+    set_etag(response, posts)
+    return response
+
+
+@router.get("/export")
+async def export_posts(request: Request, current_user: User = Depends(get_current_active_user)):
+    query = select(Post).filter(Post.owner_id == current_user.id).order_by(Post.id)
+    return ndjson_response(query, PostScheme, client_key(request))
 
 
 @router.get("/{post_id}", response_model=PostScheme)
-async def read_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    post = db.query(Post).filter((Post.owner_id == current_user.id) & (Post.id == post_id)).first()
-    if post is None:
-        raise HTTPException(status_code=404, detail="Post not found")
+async def read_post(post_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db),
+                    current_user: User = Depends(get_current_active_user)):
+    query = select(Post).filter(Post.id == post_id, Post.owner_id == current_user.id)
+    unchanged = await not_modified(request, db, query, Post.id, Post.updated_at)
+    if unchanged is not None:
+        return unchanged
+    post = await get_post_or_404(db, post_id, current_user.id)
+    set_etag(response, [post])
     return post
 
 
-@router.post("/", response_model=PostScheme, status_code=status.HTTP_201_CREATED)
-async def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+@router.get("/{post_id}/full", response_model=PostDetailScheme)
+async def read_post_full(post_id: int, limit: int = 10, db: AsyncSession = Depends(get_read_db),
+                         current_user: User = Depends(get_current_active_user)):
+    """The post with its first ``limit`` comments and their distinct authors, in three queries whatever the count."""
+    post = await get_post_or_404(db, post_id, current_user.id)
+    result = await db.execute(
+        select(Comment).filter(Comment.post_id == post.id).order_by(Comment.id).limit(limit)
+        .options(selectinload(Comment.author))
+    )
+    comments = result.scalars().all()
+    authors = {comment.author.id: comment.author for comment in comments if comment.author is not None}
+    return {"post": post, "comments": comments, "authors": list(authors.values())}
+
+
+@router.post("/", response_model=PostScheme, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
+async def create_post(post: PostCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     post = Post(**post.dict(), owner_id=current_user.id)
     db.add(post)
-    db.commit()
-    db.refresh(post)
+    await db.commit()
+    await db.refresh(post)
     return post
 
 
-@router.put("/{post_id}", response_model=PostScheme, status_code=status.HTTP_200_OK)
-async def update_post(post_id: int, post: PostUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_post = db.query(Post).filter(Post.id == post_id, Post.owner_id == current_user.id).first()
-    if db_post is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+@router.put("/{post_id}", response_model=PostScheme, status_code=status.HTTP_200_OK,
+            dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
+async def update_post(post_id: int, post: PostUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    db_post = await get_post_or_404(db, post_id, current_user.id)
 
     for key, value in post.dict(exclude_unset=True).items():
         setattr(db_post, key, value)
 
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await db.refresh(db_post)
     return db_post
 
 
-@router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_post = db.query(Post).filter(Post.id == post_id, Post.owner_id == current_user.id).first()  # Змінено
-    if not db_post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")  # Змінено
-    db.delete(db_post)
-    db.commit()
+@router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT,
+               dependencies=[Depends(write_limit), Depends(ConcurrencyLimit())])
+async def delete_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    db_post = await get_post_or_404(db, post_id, current_user.id)
+    await db.delete(db_post)
+    await db.commit()
     return {"detail": "Post deleted successfully"}
 
 
@@ -0,0 +1,22 @@
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.db_settings import get_read_db
+from db.models.user import User
+from schemas.search_schema import SearchResult
+from utils.auth import get_current_active_user
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.search import search
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/search", response_model=List[SearchResult])
+async def search_content(response: Response, q: str = Query(..., min_length=1, max_length=256),
+                         kind: Optional[Literal["post", "comment"]] = None, limit: int = Query(10, ge=1, le=100),
+                         cursor: Optional[str] = None, db: AsyncSession = Depends(get_read_db),
+                         current_user: User = Depends(get_current_active_user)):
+    results, next_cursor = await search(db, q, current_user.id, kind, limit, cursor)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return results
@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from db.db_settings import async_engine, replica_router
+from utils.breakdown_cache import breakdown_cache
+from utils.principal_cache import principal_cache
+
+router = APIRouter(prefix="/system", tags=["system"])
+
+
+@router.get("/auth-cache")
+async def auth_cache_stats():
+    return principal_cache.stats()
+
+
+@router.get("/breakdown-cache")
+async def breakdown_cache_stats():
+    return breakdown_cache.stats()
+
+
+@router.get("/pool")
+async def pool_stats():
+    """The primary's pool, with one entry per read replica pool under ``replicas``."""
+    replicas = [{"replica": index, **engine.pool.snapshot()} for index, engine in enumerate(replica_router.engines)]
+    return {**async_engine.pool.snapshot(), "replicas": replicas}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+from utils.settings import COMMENTS_BULK_LIMIT
 
 
 class CommentBase(BaseModel):
@@ -11,6 +12,10 @@ class CommentCreate(CommentBase):
     pass
 
 
+class CommentBulkCreate(BaseModel):
+    comments: List[CommentCreate] = Field(min_length=1, max_length=COMMENTS_BULK_LIMIT)
+
+
 class CommentUpdate(BaseModel):
     content: Optional[str] = None
 
@@ -20,8 +25,7 @@ class CommentScheme(CommentBase):
     post_id: int
     author_id: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class ResponseStatus(BaseModel):
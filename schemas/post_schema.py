@@ -1,5 +1,7 @@
-from pydantic import BaseModel
-from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+from typing import List, Optional
+from schemas.comment_schema import CommentScheme
 
 
 class PostBase(BaseModel):
@@ -21,6 +23,21 @@ class PostUpdate(BaseModel):
 class PostScheme(PostBase):
     id: int
     owner_id: int
+    comment_count: int = 0
+    blocked_comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AuthorScheme(BaseModel):
+    id: int
+    username: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PostDetailScheme(BaseModel):
+    post: PostScheme
+    comments: List[CommentScheme]
+    authors: List[AuthorScheme]
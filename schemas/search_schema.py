@@ -0,0 +1,11 @@
+from typing import Literal, Optional
+from pydantic import BaseModel
+
+
+class SearchResult(BaseModel):
+    kind: Literal["post", "comment"]
+    id: int
+    post_id: int
+    title: Optional[str] = None
+    content: str
+    rank: float
@@ -1,15 +1,16 @@
 from datetime import timedelta
 import pytest
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi import status
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.future import select
 from db.models.post import Post
 from main import app
-from db.db_settings import Base
+from db.db_settings import Base, async_engine
 from db.models.user import User
 from utils.auth import create_access_token
+from utils.rate_limit import rate_limit_store
 from utils.settings import DB_HOST, DB_USERNAME, DB_PASSWORD, DB_PORT, DB_DRIVER, DB_DATABASE
 
 TEST_DATABASE_URL = f"postgresql+asyncpg://{DB_USERNAME}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
@@ -18,6 +19,30 @@ test_engine = create_async_engine(TEST_DATABASE_URL, echo=True)
 TestAsyncSessionLocal = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
 
 
+@pytest.fixture(scope="module", autouse=True)
+async def dispose_app_engine(anyio_backend):
+    # Pooled asyncpg connections are bound to the event loop of the module that opened them.
+    yield
+    await async_engine.dispose()
+    await test_engine.dispose()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def isolated_rate_limits(tmp_path_factory):
+    # Buckets left behind by earlier runs on this host would throttle the test user.
+    rate_limit_store.path = str(tmp_path_factory.mktemp("rate-limits") / "buckets.sqlite3")
+
+
+@pytest.fixture
+async def sqlite_session_factory(tmp_path):
+    # SQLite stand-in for tests that exercise the persistence layer without Postgres.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
 @pytest.fixture(scope="module")
 async def db():
     async with TestAsyncSessionLocal() as session:
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import timedelta
+import pytest
+from sqlalchemy.future import select
+from db.models.autoreply_task import AutoreplyTask
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from utils.autoreply_scheduler import AutoreplyScheduler, utcnow
+
+
+async def create_post(session_factory, autoreply_delay=0):
+    async with session_factory() as db:
+        user = User(username="owner", email="owner@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Post", content="Content", autoreply=True, autoreply_delay=autoreply_delay,
+                    autoreply_msg="Thanks!", owner_id=user.id)
+        db.add(post)
+        await db.commit()
+        return post
+
+
+@pytest.mark.anyio
+async def test_run_due_creates_autoreplies_in_batches(sqlite_session_factory):
+    post = await create_post(sqlite_session_factory)
+    scheduler = AutoreplyScheduler(session_factory=sqlite_session_factory, batch_size=2)
+
+    async with sqlite_session_factory() as db:
+        for _ in range(5):
+            scheduler.schedule(db, post)
+        db.add(AutoreplyTask(post_id=post.id, due_at=utcnow() + timedelta(hours=1)))
+        await db.commit()
+
+    assert await scheduler.run_due() == 5
+
+    async with sqlite_session_factory() as db:
+        comments = (await db.execute(select(Comment))).scalars().all()
+        pending = (await db.execute(select(AutoreplyTask))).scalars().all()
+    assert [(c.content, c.author_id) for c in comments] == [("Thanks!", post.owner_id)] * 5
+    assert len(pending) == 1
+
+
+@pytest.mark.anyio
+async def test_running_scheduler_wakes_up_on_notify(sqlite_session_factory):
+    post = await create_post(sqlite_session_factory)
+    scheduler = AutoreplyScheduler(session_factory=sqlite_session_factory, poll_interval=60)
+    await scheduler.start()
+    try:
+        async with sqlite_session_factory() as db:
+            task = scheduler.schedule(db, post)
+            await db.commit()
+        scheduler.notify(task.due_at)
+
+        for _ in range(50):
+            async with sqlite_session_factory() as db:
+                if (await db.execute(select(Comment))).scalars().first() is not None:
+                    break
+            await asyncio.sleep(0.05)
+        else:
+            pytest.fail("autoreply was not created")
+    finally:
+        await scheduler.stop()
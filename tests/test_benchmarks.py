@@ -0,0 +1,32 @@
+import json
+from argparse import Namespace
+from benchmarks.loadtest import compare, summarize
+
+
+def test_summary_uses_observed_latencies():
+    stats = summarize([i / 1000 for i in range(1, 101)], errors=2, elapsed=2.0)
+
+    assert stats["requests"] == 100
+    assert stats["throughput_rps"] == 50.0
+    assert (stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+
+
+def test_compare_flags_regressions_beyond_tolerance(tmp_path):
+    def write(name, p95, rps):
+        path = tmp_path / name
+        path.write_text(json.dumps({"routes": {"GET /posts/": {"p95_ms": p95, "throughput_rps": rps, "errors": 0}}}))
+        return str(path)
+
+    baseline = write("baseline.json", 10.0, 100.0)
+
+    assert compare(Namespace(results=write("same.json", 10.5, 97.0), baseline=baseline, tolerance=0.1)) == 0
+    assert compare(Namespace(results=write("slow.json", 12.0, 100.0), baseline=baseline, tolerance=0.1)) == 1
+
+
+def test_compare_flags_routes_missing_from_the_run(tmp_path):
+    stats = {"p95_ms": 10.0, "throughput_rps": 100.0, "errors": 0}
+    baseline, results = tmp_path / "baseline.json", tmp_path / "results.json"
+    baseline.write_text(json.dumps({"routes": {"GET /posts/": stats, "GET /search": stats}}))
+    results.write_text(json.dumps({"routes": {"GET /posts/": stats}}))
+
+    assert compare(Namespace(results=str(results), baseline=str(baseline), tolerance=0.1)) == 1
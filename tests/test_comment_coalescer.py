@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+from db.db_settings import async_engine
+from db.models.autoreply_task import AutoreplyTask
+from db.models.post import Post
+from db.models.user import User
+from main import app
+from routes import comments as comment_routes
+from utils.comment_coalescer import CommentCoalescer, comment_coalescer
+
+
+@pytest.mark.anyio
+async def test_concurrent_inserts_share_one_commit(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="coalesced", email="coalesced@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Busy", content="Post", owner_id=user.id, autoreply=True, autoreply_delay=60)
+        db.add(post)
+        await db.commit()
+
+    coalescer = CommentCoalescer(session_factory=sqlite_session_factory, max_batch=10, max_delay_ms=20)
+    rows = [{"content": f"comment {i}", "post_id": post.id, "author_id": user.id, "is_blocked": False}
+            for i in range(5)]
+    created = await asyncio.gather(*(coalescer.insert(row) for row in rows))
+
+    assert [comment.content for comment in created] == [row["content"] for row in rows]
+    assert len({comment.id for comment in created}) == 5
+    assert (coalescer.batches, coalescer.rows) == (1, 5)
+    async with sqlite_session_factory() as db:
+        assert (await db.execute(select(Post.comment_count).filter(Post.id == post.id))).scalar() == 5
+        assert len((await db.execute(select(AutoreplyTask))).scalars().all()) == 5
+
+    # A full batch is written right away, and a rejected row only fails its own caller.
+    coalescer = CommentCoalescer(session_factory=sqlite_session_factory, max_batch=3, max_delay_ms=60_000)
+    results = await asyncio.gather(
+        coalescer.insert(rows[0]), coalescer.insert({**rows[1], "id": created[0].id}), coalescer.insert(rows[2]),
+        return_exceptions=True,
+    )
+    assert isinstance(results[1], IntegrityError)
+    assert [results[0].content, results[2].content] == [rows[0]["content"], rows[2]["content"]]
+
+
+@pytest.mark.anyio
+async def test_create_comment_route_coalesces(monkeypatch, test_user, test_post):
+    monkeypatch.setattr(comment_routes, "COMMENT_COALESCING", True)
+    monkeypatch.setattr(comment_coalescer, "max_delay", 0.2)
+    batches = comment_coalescer.batches
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        pending = asyncio.gather(*(
+            ac.post("/comments/", json={"content": f"Together {i}", "post_id": test_post["id"]}, headers=headers)
+            for i in range(4)
+        ))
+        await asyncio.sleep(0.1)
+        # Waiting for the batch holds no pooled connection.
+        assert async_engine.pool.checkedout() == 0
+        responses = await pending
+        missing = await ac.post("/comments/", json={"content": "Nowhere", "post_id": 999999}, headers=headers)
+
+    assert [response.status_code for response in responses] == [status.HTTP_201_CREATED] * 4
+    assert len({response.json()["data"]["id"] for response in responses}) == 4
+    assert comment_coalescer.batches - batches < 4
+    assert missing.status_code == status.HTTP_404_NOT_FOUND
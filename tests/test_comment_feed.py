@@ -0,0 +1,220 @@
+import asyncio
+import json
+import uuid
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from main import app
+from utils.auth import create_access_token
+from utils.comment_feed import CommentFeed, comment_feed
+from utils.pagination import NEXT_CURSOR_HEADER, encode_cursor
+
+
+async def wait_for_subscribers(count: int):
+    async with asyncio.timeout(5):
+        while comment_feed.subscriber_count < count:
+            await asyncio.sleep(0.01)
+
+
+async def collect(feed: CommentFeed, subscription, last_id=None) -> list:
+    async with asyncio.timeout(5):
+        return [event async for event in feed.events(subscription, last_id) if event is not None]
+
+
+@pytest.mark.anyio
+async def test_slow_subscriber_catches_up_from_database(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="watcher", email="watcher@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Watched", content="Post", owner_id=user.id)
+        db.add(post)
+        await db.flush()
+        comments = [Comment(content=f"comment {i}", post_id=post.id, author_id=user.id) for i in range(5)]
+        comments.append(Comment(content="x" * 9000, post_id=post.id, author_id=user.id))
+        db.add_all(comments)
+        await db.commit()
+    ids = [comment.id for comment in comments]
+
+    feed = CommentFeed(session_factory=sqlite_session_factory, queue_size=2, backfill_limit=10, heartbeat=60)
+    async with feed.subscribe(post.id) as subscription:
+        # Five comments for a queue of two: the writer is not held up, the subscriber reads them back instead.
+        for payload in feed.payloads(comments[:5]):
+            feed.dispatch(payload)
+        assert (feed.delivered, feed.dropped) == (2, 3)
+        feed.close()
+        assert [event.id for event in await collect(feed, subscription)] == ids
+
+    async with feed.subscribe(post.id) as subscription:
+        # Too large for a NOTIFY payload, so only its id is sent and the comment is read from the database.
+        [payload] = feed.payloads(comments[5:])
+        assert json.loads(payload) == {"post_id": post.id, "ids": [ids[5]]}
+        feed.dispatch(payload)
+        async with asyncio.timeout(5):
+            event = await anext(feed.events(subscription))
+        assert (event.kind, event.id, json.loads(event.data)["content"]) == ("comment", ids[5], "x" * 9000)
+
+    feed.backfill_limit = 3
+    async with feed.subscribe(post.id) as subscription:
+        feed.close()
+        [event] = await collect(feed, subscription, last_id=0)
+        assert (event.kind, json.loads(event.data)) == ("resync", {"post_id": post.id, "cursor": encode_cursor(0)})
+
+
+@pytest.mark.anyio
+async def test_blocked_comments_never_reach_subscribers(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        owner = User(username="owner", email="owner@example.com", password="hashed")
+        author = User(username="troll", email="troll@example.com", password="hashed")
+        db.add_all([owner, author])
+        await db.flush()
+        post = Post(title="Moderated", content="Post", owner_id=owner.id)
+        db.add(post)
+        await db.flush()
+        blocked = Comment(content="blocked", post_id=post.id, author_id=author.id, is_blocked=True)
+        visible = Comment(content="visible", post_id=post.id, author_id=author.id, is_blocked=False)
+        db.add_all([blocked, visible])
+        await db.commit()
+
+    feed = CommentFeed(session_factory=sqlite_session_factory, queue_size=10, backfill_limit=10, heartbeat=60)
+    assert [json.loads(payload)["comments"] for payload in feed.payloads([blocked, visible])] == [
+        [{"content": "visible", "post_id": post.id, "id": visible.id, "author_id": author.id}]
+    ]
+    assert feed.payloads([blocked]) == []
+
+    async with feed.subscribe(post.id) as subscription:
+        # Not when only the ids were sent either.
+        feed.dispatch(json.dumps({"post_id": post.id, "ids": [blocked.id, visible.id]}))
+        await asyncio.gather(*feed._fetches)
+        feed.close()
+        assert [event.id for event in await collect(feed, subscription)] == [visible.id]
+
+    async with feed.subscribe(post.id) as subscription:
+        # Nor when the subscriber catches up from the database.
+        feed.close()
+        assert [event.id for event in await collect(feed, subscription, last_id=0)] == [visible.id]
+
+
+@pytest.mark.anyio
+async def test_resync_catches_up_from_where_a_new_subscriber_started(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="latecomer", email="latecomer@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="History", content="Post", owner_id=user.id)
+        db.add(post)
+        await db.flush()
+        db.add_all([Comment(content=f"old {i}", post_id=post.id, author_id=user.id) for i in range(3)])
+        await db.commit()
+
+    feed = CommentFeed(session_factory=sqlite_session_factory, queue_size=10, backfill_limit=10, heartbeat=60)
+    async with feed.subscribe(post.id) as subscription:
+        events = asyncio.create_task(collect(feed, subscription))
+        async with asyncio.timeout(5):
+            while subscription.last_id is None:
+                await asyncio.sleep(0.01)
+        # Committed while the listener was down, so its notification never arrived.
+        async with sqlite_session_factory() as db:
+            missed = Comment(content="missed", post_id=post.id, author_id=user.id)
+            db.add(missed)
+            await db.commit()
+        feed.resync()
+        feed.close()
+        assert [event.id for event in await events] == [missed.id]
+
+
+@pytest.mark.anyio
+async def test_stream_pushes_new_comments(test_user, test_post):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    url = f"/posts/{test_post['id']}/comments/stream"
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        stream = asyncio.create_task(ac.get(url, headers=headers))
+        await wait_for_subscribers(1)
+        created = await ac.post("/comments/", json={"content": "Live", "post_id": test_post["id"]}, headers=headers)
+        comment_feed.close()
+        response = await stream
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+        comment = created.json()["data"]
+        assert f"id: {comment['id']}\nevent: comment\ndata: {json.dumps(comment)}\n\n" in response.text
+
+        # A reconnecting client gets what it missed from the database.
+        stream = asyncio.create_task(ac.get(url, headers={**headers, "Last-Event-ID": str(comment["id"] - 1)}))
+        await wait_for_subscribers(1)
+        comment_feed.close()
+        assert f"id: {comment['id']}\n" in (await stream).text
+
+        missing = await ac.get("/posts/999999/comments/stream", headers=headers)
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.anyio
+async def test_owner_refetches_every_visible_comment_on_the_post(db, test_user, test_post):
+    username = f"commenter-{uuid.uuid4().hex[:12]}"
+    commenter = User(username=username, email=f"{username}@example.com", password="hashed")
+    db.add(commenter)
+    await db.flush()
+    visible = Comment(content="From someone else", post_id=test_post["id"], author_id=commenter.id)
+    blocked = Comment(content="Blocked", post_id=test_post["id"], author_id=commenter.id, is_blocked=True)
+    db.add_all([visible, blocked])
+    await db.commit()
+
+    url = f"/posts/{test_post['id']}/comments"
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        # Paged the way a client follows the cursor of a ``resync`` event.
+        ids, params = [], {"limit": 2, "cursor": encode_cursor(visible.id - 1)}
+        while True:
+            response = await ac.get(url, params=params, headers={"Authorization": f"Bearer {test_user['token']}"})
+            assert response.status_code == status.HTTP_200_OK
+            ids += [comment["id"] for comment in response.json()]
+            if NEXT_CURSOR_HEADER not in response.headers:
+                break
+            params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+        assert visible.id in ids and blocked.id not in ids
+
+        # Only the post's owner sees them.
+        token = create_access_token(data={"sub": username})
+        response = await ac.get(url, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def open_websocket(path: str, query: str):
+    incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+    incoming.put_nowait({"type": "websocket.connect"})
+    scope = {
+        "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1", "path": path,
+        "raw_path": path.encode(), "root_path": "", "query_string": query.encode(), "headers": [],
+        "client": ("127.0.0.1", 50000), "server": ("test", 80), "subprotocols": [],
+    }
+    task = asyncio.create_task(app(scope, incoming.get, outgoing.put))
+    return incoming, outgoing, task
+
+
+@pytest.mark.anyio
+async def test_websocket_pushes_new_comments(test_user, test_post):
+    path = f"/posts/{test_post['id']}/comments/ws"
+    incoming, outgoing, session = await open_websocket(path, f"token={test_user['token']}")
+    async with asyncio.timeout(5):
+        assert (await outgoing.get())["type"] == "websocket.accept"
+        await wait_for_subscribers(1)
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+            created = await ac.post("/comments/", json={"content": "Over the socket", "post_id": test_post["id"]},
+                                    headers={"Authorization": f"Bearer {test_user['token']}"})
+        message = json.loads((await outgoing.get())["text"])
+        assert message == {"event": "comment", "id": created.json()["data"]["id"], "data": created.json()["data"]}
+
+        incoming.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await session
+    assert comment_feed.subscriber_count == 0
+
+    _, outgoing, session = await open_websocket(path, "token=invalid")
+    async with asyncio.timeout(5):
+        await session
+        closed = await outgoing.get()
+    assert (closed["type"], closed["code"]) == ("websocket.close", status.WS_1008_POLICY_VIOLATION)
@@ -0,0 +1,64 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from db.models.comment import Comment
+from db.models.comment_daily_stats import CommentDailyStats
+from db.models.post import Post
+from utils import comment_partitions, comment_stats
+
+
+def relations(plan: dict) -> set[str]:
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= relations(child)
+    return found
+
+
+@pytest.mark.anyio
+async def test_range_filters_only_read_their_partitions(db: AsyncSession):
+    month = comment_partitions.month_start(date.today())
+    query = select(func.count()).select_from(Comment).filter(
+        Comment.created_at >= month, Comment.created_at < comment_partitions.add_months(month, 1)
+    )
+    compiled = query.compile(db.get_bind(), compile_kwargs={"literal_binds": True})
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+
+    assert relations(result.scalar()[0]["Plan"]) == {comment_partitions.partition_name(month)}
+
+
+@pytest.mark.anyio
+async def test_stray_rows_get_a_partition_and_retention_drops_it(db: AsyncSession, test_user):
+    post = Post(title="Retention", content="Old comments", owner_id=test_user["id"])
+    db.add(post)
+    await db.flush()
+    recent = Comment(content="recent", post_id=post.id, author_id=test_user["id"])
+    old = Comment(content="old", post_id=post.id, author_id=test_user["id"], created_at=datetime(2001, 1, 15))
+    db.add_all([recent, old])
+    await db.flush()
+    await comment_stats.record_comments_created(db, [recent, old])
+    await db.commit()
+
+    assert "comments_y2001m01" in await comment_partitions.ensure_partitions(db, months_ahead=0)
+    moved = await db.execute(text("SELECT count(*) FROM comments_y2001m01 WHERE id = :id"), {"id": old.id})
+    assert moved.scalar() == 1
+
+    # Lands in the default partition, and is removed from there.
+    older = Comment(content="older", post_id=post.id, author_id=test_user["id"], created_at=datetime(2000, 6, 1))
+    db.add(older)
+    await db.flush()
+    await comment_stats.record_comment_created(db, older)
+    await db.commit()
+
+    assert await comment_partitions.drop_comments_before(db, date(2001, 2, 1)) == ["comments_y2001m01"]
+
+    remaining = await db.execute(select(Comment.id).filter(Comment.post_id == post.id))
+    assert remaining.scalars().all() == [recent.id]
+    counters = await db.execute(select(Post.comment_count, Post.last_comment_at).filter(Post.id == post.id))
+    assert tuple(counters.one()) == (1, recent.created_at)
+    rollups = await db.execute(select(func.count()).select_from(CommentDailyStats).filter(
+        CommentDailyStats.day < date(2001, 2, 1)
+    ))
+    assert rollups.scalar() == 0
+    assert date(2001, 1, 1) not in await comment_partitions.month_partitions(db)
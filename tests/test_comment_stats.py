@@ -0,0 +1,94 @@
+from datetime import date, datetime
+import pytest
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from utils import comment_stats
+from utils.breakdown_cache import BreakdownCache, breakdown_cache
+
+
+async def seed_comments(db):
+    user = User(username="author", email="author@example.com", password="hashed")
+    db.add(user)
+    await db.flush()
+    post = Post(title="Post", content="Content", owner_id=user.id)
+    db.add(post)
+    await db.flush()
+    db.add_all([
+        Comment(content="a", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 1, 10)),
+        Comment(content="b", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 1, 23), is_blocked=True),
+        Comment(content="c", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 3, 8)),
+    ])
+    await db.commit()
+    return user, post
+
+
+@pytest.mark.anyio
+async def test_breakdown_falls_back_to_live_counts(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        await seed_comments(db)
+        summary = await comment_stats.daily_breakdown(db, date(2024, 1, 1), date(2024, 1, 3))
+
+    assert summary == [
+        {"date": "2024-01-01", "total_comments": 2, "blocked_comments": 1},
+        {"date": "2024-01-03", "total_comments": 1, "blocked_comments": 0},
+    ]
+
+
+@pytest.mark.anyio
+async def test_rollup_tracks_writes_after_backfill(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user, post = await seed_comments(db)
+        assert await comment_stats.backfill(db, date(2024, 1, 1), date(2024, 1, 3)) == 3
+
+        comment = Comment(content="d", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 2, 12))
+        db.add(comment)
+        await db.flush()
+        await comment_stats.record_comment_created(db, comment)
+        comment.is_blocked = True
+        await comment_stats.record_comment_block_changed(db, comment)
+        await db.commit()
+
+        # Rows that bypass the rollup are invisible once a day is covered.
+        db.add(Comment(content="e", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 3, 9)))
+        await db.commit()
+
+        summary = await comment_stats.daily_breakdown(db, date(2024, 1, 1), date(2024, 1, 3))
+
+    assert summary == [
+        {"date": "2024-01-01", "total_comments": 2, "blocked_comments": 1},
+        {"date": "2024-01-02", "total_comments": 1, "blocked_comments": 1},
+        {"date": "2024-01-03", "total_comments": 1, "blocked_comments": 0},
+    ]
+
+
+@pytest.mark.anyio
+async def test_cached_breakdown_only_drops_written_days(sqlite_session_factory):
+    breakdown_cache.clear()
+    days = [date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)]
+    async with sqlite_session_factory() as db:
+        user, post = await seed_comments(db)
+        await comment_stats.daily_breakdown(db, days[0], days[-1], cache=breakdown_cache)
+        assert breakdown_cache.get_many(days).keys() == set(days)
+        invalidations = breakdown_cache.stats()["invalidations"]
+
+        comment = Comment(content="d", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 2, 12))
+        db.add(comment)
+        await db.flush()
+        await comment_stats.record_comment_created(db, comment)
+        assert breakdown_cache.get_many(days).keys() == set(days)
+        await db.commit()
+
+        assert breakdown_cache.get_many(days).keys() == {days[0], days[2]}
+        summary = await comment_stats.daily_breakdown(db, days[0], days[-1], cache=breakdown_cache)
+
+    assert summary[1] == {"date": "2024-01-02", "total_comments": 1, "blocked_comments": 0}
+    assert breakdown_cache.stats()["invalidations"] == invalidations + 1
+
+
+def test_closed_days_from_a_replica_expire():
+    cache = BreakdownCache(maxsize=10, ttl=-1)
+    cache.put_many({date(2024, 1, 1): (2, 1)}, cache.version)
+    cache.put_many({date(2024, 1, 2): (1, 0)}, cache.version, from_replica=True)
+    # A replica may still be behind the invalidation that emptied these days, so only the primary's count stays.
+    assert cache.get_many([date(2024, 1, 1), date(2024, 1, 2)]) == {date(2024, 1, 1): (2, 1)}
@@ -0,0 +1,57 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from fastapi import status
+from db.models.autoreply_task import AutoreplyTask
+from main import app
+
+
+@pytest.mark.anyio
+async def test_create_comments_bulk(db: AsyncSession, test_user, test_post):
+    payload = {"comments": [
+        {"content": "First", "post_id": test_post["id"]},
+        {"content": "Missing", "post_id": 999999},
+        {"content": "Second", "post_id": test_post["id"]},
+    ]}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/comments/bulk", json=payload,
+                                 headers={"Authorization": f"Bearer {test_user['token']}"})
+
+    assert response.status_code == status.HTTP_200_OK
+    results = response.json()
+    assert [item["status"] for item in results] == ["success", "error", "success"]
+    assert [results[0]["data"]["content"], results[2]["data"]["content"]] == ["First", "Second"]
+    assert results[0]["data"]["author_id"] == test_user["id"]
+
+    pending = await db.execute(select(func.count()).select_from(AutoreplyTask).filter(AutoreplyTask.post_id == test_post["id"]))
+    assert pending.scalar() == 1
+
+
+@pytest.mark.anyio
+async def test_create_comments_bulk_rejects_empty_batch(test_user):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/comments/bulk", json={"comments": []},
+                                 headers={"Authorization": f"Bearer {test_user['token']}"})
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.anyio
+async def test_read_comments_conditional_get(test_user, test_post):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    params = {"post_id": test_post["id"], "limit": 1000}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/comments/", json={"content": "Etag", "post_id": test_post["id"]}, headers=headers)
+        first = await ac.get("/comments/", params=params, headers=headers)
+        etag = first.headers["ETag"]
+
+        cached = await ac.get("/comments/", params=params, headers={**headers, "If-None-Match": f'"other", {etag}'})
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+
+        await ac.post("/comments/", json={"content": "Newer", "post_id": test_post["id"]}, headers=headers)
+        changed = await ac.get("/comments/", params=params, headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == status.HTTP_200_OK
+        assert len(changed.json()) == len(first.json()) + 1
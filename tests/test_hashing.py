@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+from utils.hashing import HashingService, pwd_context
+
+
+@pytest.fixture
+def hashing():
+    service = HashingService(max_workers=1, max_queue=4)
+    yield service
+    service.shutdown()
+
+
+@pytest.mark.anyio
+async def test_hash_and_verify_run_in_the_pool(hashing):
+    hashed = await hashing.hash("secret")
+    assert await hashing.verify_and_update("secret", hashed) == (True, None)
+    assert await hashing.verify_and_update("wrong", hashed) == (False, None)
+
+
+@pytest.mark.anyio
+async def test_outdated_cost_factor_is_rehashed(hashing):
+    hashed = pwd_context.hash("secret", rounds=4)
+    verified, new_hash = await hashing.verify_and_update("secret", hashed)
+    assert verified
+    assert pwd_context.verify("secret", new_hash)
+    assert not pwd_context.needs_update(new_hash)
+
+
+@pytest.mark.anyio
+async def test_full_queue_is_rejected_with_503(hashing):
+    hashing.pending = hashing.max_queue
+    with pytest.raises(HTTPException) as exc_info:
+        await hashing.hash("secret")
+    assert exc_info.value.status_code == 503
@@ -0,0 +1,49 @@
+import signal
+import pytest
+import uvicorn
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from main import app
+from utils.lifecycle import server_state
+from utils.server import DrainingServer, available_cores, production_options
+
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(server_state, "ready", False)
+    monkeypatch.setattr(server_state, "draining", False)
+    return server_state
+
+
+@pytest.mark.anyio
+async def test_readiness_follows_the_lifespan(fresh_state):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        assert (await ac.get("/health/ready")).json() == {"status": "starting"}
+
+        async with app.router.lifespan_context(app):
+            assert (await ac.get("/health/ready")).status_code == status.HTTP_200_OK
+
+        response = await ac.get("/health/ready")
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json() == {"status": "draining"}
+        assert (await ac.get("/health/live")).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.anyio
+async def test_first_signal_drains_before_exiting(fresh_state):
+    fresh_state.ready = True
+    server = DrainingServer(uvicorn.Config(app), drain_seconds=0.05)
+
+    server.handle_exit(signal.SIGTERM, None)
+    assert fresh_state.draining and not fresh_state.ready
+    assert not server.should_exit
+
+    server.drain_deadline = 0
+    assert await server.on_tick(1)
+
+
+def test_production_options_default_to_one_worker_per_core():
+    options = production_options(workers=0)
+    assert options["workers"] == available_cores()
+    assert options["loop"] in ("uvloop", "asyncio")
+    assert production_options(workers=3)["workers"] == 3
@@ -0,0 +1,49 @@
+import pytest
+from fastapi import Depends, FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from utils.metrics import Metrics, MetricsMiddleware, RequestStats, QUERY_COUNT_HEADER
+
+
+@pytest.mark.anyio
+async def test_queries_are_attributed_to_the_route(sqlite_session_factory):
+    registry = Metrics(directory="")
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, registry=registry, debug_headers=True)
+
+    async def get_db():
+        async with sqlite_session_factory() as db:
+            yield db
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int, db=Depends(get_db)):
+        for _ in range(3):
+            await db.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/items/1")
+        await ac.get("/items/2")
+
+    assert response.headers[QUERY_COUNT_HEADER] == "3"
+    exposition = registry.render()
+    assert 'http_requests_total{method="GET",route="/items/{item_id}",status="200"} 2' in exposition
+    assert 'db_queries_total{method="GET",route="/items/{item_id}"} 6' in exposition
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 2' in exposition
+    assert 'db_queries_per_request_bucket{method="GET",route="/items/{item_id}",le="3"} 2' in exposition
+
+
+def test_workers_sharing_a_directory_are_summed(tmp_path):
+    workers = [Metrics(directory=str(tmp_path)), Metrics(directory=str(tmp_path))]
+    for count, worker in enumerate(workers, start=1):
+        stats = RequestStats()
+        stats.queries = count
+        worker.observe_request("GET", "/posts/", 200, 0.02, stats)
+    workers[0].flush()
+
+    exposition = workers[1].render()
+
+    assert 'http_requests_total{method="GET",route="/posts/",status="200"} 2' in exposition
+    assert 'db_queries_total{method="GET",route="/posts/"} 3' in exposition
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/posts/",le="0.01"} 0' in exposition
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/posts/",le="0.025"} 2' in exposition
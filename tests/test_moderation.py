@@ -0,0 +1,108 @@
+import os
+from datetime import date, datetime
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.future import select
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from main import app
+from utils import comment_stats, moderation
+from utils.moderation import ModerationService
+from utils.term_matcher import TermMatcher
+
+
+@pytest.fixture
+def terms_file(tmp_path):
+    path = tmp_path / "terms.txt"
+    path.write_text("# blocked terms\nspam\nbuy now\nc++\n")
+    return path
+
+
+def test_matcher_finds_whole_terms_only():
+    matcher = TermMatcher(["ass", "hers", "she", "his", "buy  now", "c++"])
+
+    assert matcher.matches("Ushers") is False
+    assert matcher.matches("she said")
+    assert matcher.matches("That is HIS!")
+    assert matcher.matches("Buy now, pay later")
+    assert matcher.matches("buy  now") and matcher.matches("buy\nnow") and matcher.matches("buy\t \u00a0now!")
+    assert matcher.matches("written in c++11")
+    assert not matcher.matches("first class")
+    assert not matcher.matches("buy nowhere")
+    assert not TermMatcher([]).matches("anything")
+
+
+@pytest.mark.anyio
+async def test_term_file_is_reloaded_when_it_changes(terms_file):
+    service = ModerationService(terms_file=str(terms_file), max_workers=0)
+    assert await service.check(["no spam please", "eggs", None]) == [True, False, False]
+
+    terms_file.write_text("eggs\n")
+    os.utime(terms_file, ns=(0, 1))
+    assert await service.check(["no spam please", "eggs"]) == [False, True]
+
+
+@pytest.mark.anyio
+async def test_checks_run_in_the_pool(terms_file):
+    service = ModerationService(terms_file=str(terms_file), max_workers=2)
+    try:
+        texts = ["fine", "spam", "buy now", "fine too", "ok"]
+        assert await service.check(texts) == [False, True, True, False, False]
+    finally:
+        service.shutdown()
+
+
+@pytest.mark.anyio
+async def test_rescan_updates_flags_and_counters(sqlite_session_factory, terms_file):
+    async with sqlite_session_factory() as db:
+        user = User(username="moderated", email="moderated@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Post", content="Content", owner_id=user.id)
+        db.add(post)
+        await db.flush()
+        comments = [
+            Comment(content=content, post_id=post.id, author_id=user.id, is_blocked=blocked,
+                    created_at=datetime(2024, 1, 1, 10))
+            for content, blocked in [("spam", False), ("hello", True), ("hi", False), ("buy now", False), ("yo", False)]
+        ]
+        db.add_all(comments)
+        await db.flush()
+        await comment_stats.record_comments_created(db, comments)
+        await db.commit()
+
+        service = ModerationService(terms_file=str(terms_file), max_workers=0)
+        assert await moderation.rescan(db, service, batch_size=2) == (5, 3)
+
+        flags = await db.execute(select(Comment.content, Comment.is_blocked).order_by(Comment.id))
+        assert [blocked for _, blocked in flags.all()] == [True, False, False, True, False]
+        blocked_count = await db.execute(select(Post.blocked_comment_count).filter(Post.id == post.id))
+        assert blocked_count.scalar() == 2
+        breakdown = await comment_stats.daily_breakdown(db, date(2024, 1, 1), date(2024, 1, 1))
+        assert breakdown[0]["blocked_comments"] == 2
+
+
+@pytest.mark.anyio
+async def test_comment_routes_moderate_content(monkeypatch, terms_file, db, test_user, test_post):
+    monkeypatch.setattr(moderation.moderation_service, "terms_file", str(terms_file))
+    monkeypatch.setattr(moderation.moderation_service, "max_workers", 0)
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        created = await ac.post("/comments/", json={"content": "Great spam", "post_id": test_post["id"]},
+                                headers=headers)
+        assert created.status_code == status.HTTP_201_CREATED
+        comment_id = created.json()["data"]["id"]
+        bulk = await ac.post("/comments/bulk", json={"comments": [
+            {"content": "fine", "post_id": test_post["id"]},
+            {"content": "BUY NOW", "post_id": test_post["id"]},
+        ]}, headers=headers)
+        bulk_ids = [item["data"]["id"] for item in bulk.json()]
+        updated = await ac.put(f"/comments/{comment_id}", json={"content": "Great post"}, headers=headers,
+                               params={"post_id": test_post["id"], "author_id": test_user["id"]})
+        assert updated.status_code == status.HTTP_200_OK
+
+    result = await db.execute(select(Comment.id, Comment.is_blocked).filter(Comment.id.in_([comment_id, *bulk_ids])))
+    assert dict(result.all()) == {comment_id: False, bulk_ids[0]: False, bulk_ids[1]: True}
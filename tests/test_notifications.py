@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from utils.notifications import NotificationHub
+
+
+@pytest.mark.anyio
+async def test_hub_listens_again_after_losing_its_connection(db: AsyncSession):
+    received, reconnected = [], []
+    hub = NotificationHub(check_interval=0.1, max_retry_delay=0.1)
+    hub.subscribe("test_channel", received.append)
+    hub.on_reconnect(lambda: reconnected.append(True))
+    await hub.start()
+    try:
+        assert hub.listening
+        await db.execute(select(func.pg_terminate_backend(hub._connection.get_server_pid())))
+        await db.commit()
+
+        async with asyncio.timeout(5):
+            while not reconnected:
+                await asyncio.sleep(0.05)
+        assert hub.listening and hub.reconnects == 1
+
+        await hub.notify(db, "test_channel", "after reconnect")
+        await db.commit()
+        async with asyncio.timeout(5):
+            while not received:
+                await asyncio.sleep(0.05)
+        assert received == ["after reconnect"]
+    finally:
+        await hub.stop()
+    assert not hub.listening
@@ -0,0 +1,31 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from db.pool_metrics import InstrumentedAsyncQueuePool
+
+
+@pytest.mark.anyio
+async def test_checkouts_and_timeouts_are_counted(tmp_path):
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedAsyncQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    other = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'other.db'}", poolclass=InstrumentedAsyncQueuePool)
+    metrics = engine.pool.metrics
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            assert engine.pool.snapshot()["checked_out"] == 1
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+        async with other.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    finally:
+        await engine.dispose()
+        await other.dispose()
+
+    # Counted per pool, and kept when dispose() swaps in a fresh pool.
+    assert engine.pool.metrics is metrics
+    assert (metrics.checkouts, metrics.timeouts) == (1, 1)
+    assert (other.pool.metrics.checkouts, other.pool.metrics.timeouts) == (1, 0)
@@ -0,0 +1,52 @@
+from datetime import datetime
+import pytest
+from sqlalchemy.future import select
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from utils import comment_stats, post_counters
+
+
+async def counters(db, post_id):
+    result = await db.execute(
+        select(Post.comment_count, Post.blocked_comment_count, Post.last_comment_at).filter(Post.id == post_id)
+    )
+    return tuple(result.one())
+
+
+@pytest.mark.anyio
+async def test_counters_follow_comment_writes(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="author", email="author@example.com", password="hashed")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Post", content="Content", owner_id=user.id)
+        db.add(post)
+        await db.flush()
+
+        comments = [
+            Comment(content="a", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 1, 10)),
+            Comment(content="b", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 2, 10)),
+            Comment(content="c", post_id=post.id, author_id=user.id, created_at=datetime(2024, 1, 3, 10)),
+        ]
+        db.add_all(comments)
+        await db.flush()
+        await comment_stats.record_comments_created(db, comments)
+        await db.commit()
+        assert await counters(db, post.id) == (3, 0, datetime(2024, 1, 3, 10))
+
+        comments[0].is_blocked = True
+        await comment_stats.record_comment_block_changed(db, comments[0])
+        await comment_stats.record_comment_deleted(db, comments[2])
+        await db.delete(comments[2])
+        await db.commit()
+        assert await counters(db, post.id) == (2, 1, datetime(2024, 1, 2, 10))
+
+        # Deleting an older comment keeps the latest timestamp.
+        await comment_stats.record_comment_deleted(db, comments[0])
+        await db.delete(comments[0])
+        await db.commit()
+        assert await counters(db, post.id) == (1, 0, datetime(2024, 1, 2, 10))
+
+        await post_counters.backfill(db)
+        assert await counters(db, post.id) == (1, 0, datetime(2024, 1, 2, 10))
@@ -1,8 +1,16 @@
+import json
 import pytest
+from sqlalchemy import event, insert, select
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import status
+from db.db_settings import async_engine
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
 from main import app
+from schemas.post_schema import PostScheme
+from utils.serialization import columns_for, row_dicts
 
 
 @pytest.mark.anyio
@@ -67,4 +75,106 @@ async def test_delete_post(db: AsyncSession, test_user, test_post):
 
         delete_response = await ac.delete(f"/posts/{test_post['id']}",
                                           headers={"Authorization": f"Bearer {test_user['token']}"})
-        assert delete_response.status_code == status.HTTP_204_NO_CONTENT
\ No newline at end of file
+        assert delete_response.status_code == status.HTTP_204_NO_CONTENT
+
+@pytest.mark.anyio
+async def test_read_posts_with_cursor(db: AsyncSession, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for i in range(3):
+            await ac.post("/posts/", json={"title": f"Cursor Post {i}", "content": "Paged"}, headers=headers)
+
+        seen = []
+        response = await ac.get("/posts/", params={"limit": 2}, headers=headers)
+        while True:
+            assert response.status_code == status.HTTP_200_OK
+            seen.extend(post["id"] for post in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            response = await ac.get("/posts/", params={"limit": 2, "cursor": cursor}, headers=headers)
+
+        invalid = await ac.get("/posts/", params={"cursor": "not-a-cursor"}, headers=headers)
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) >= 3
+    assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.anyio
+async def test_export_posts(db: AsyncSession, test_user):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/posts/export", headers={"Authorization": f"Bearer {test_user['token']}"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    # Every post the user owns, however many earlier runs left in the database.
+    query = select(*columns_for(PostScheme, Post)).filter(Post.owner_id == test_user["id"]).order_by(Post.id)
+    rows = await db.execute(query)
+    assert exported == [PostScheme.model_validate(row).model_dump(mode="json") for row in row_dicts(rows.all())]
+
+
+@pytest.mark.anyio
+async def test_read_post_conditional_get(db: AsyncSession, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        post = (await ac.post("/posts/", json={"title": "Cached", "content": "Etag"}, headers=headers)).json()
+        first = await ac.get(f"/posts/{post['id']}", headers=headers)
+        etag = first.headers["ETag"]
+        assert etag.startswith('W/"')
+
+        cached = await ac.get(f"/posts/{post['id']}", headers={**headers, "If-None-Match": etag})
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert cached.headers["ETag"] == etag
+        assert cached.content == b""
+
+        await ac.put(f"/posts/{post['id']}", json={"title": "Changed"}, headers=headers)
+        changed = await ac.get(f"/posts/{post['id']}", headers={**headers, "If-None-Match": etag})
+        assert changed.status_code == status.HTTP_200_OK
+        assert changed.headers["ETag"] != etag
+        assert changed.json()["title"] == "Changed"
+
+
+@pytest.mark.anyio
+async def test_read_post_full_runs_fixed_number_of_queries(db: AsyncSession, test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def fetch_counting(ac, post_id):
+        statements.clear()
+        event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+        try:
+            response = await ac.get(f"/posts/{post_id}/full", params={"limit": 50}, headers=headers)
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+        assert response.status_code == status.HTTP_200_OK
+        return response.json(), len(statements)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        post = (await ac.post("/posts/", json={"title": "Full", "content": "Detail"}, headers=headers)).json()
+        await ac.post("/comments/", json={"content": "Own", "post_id": post["id"]}, headers=headers)
+        # Warms the principal cache, so the counted requests only run the route's own queries.
+        await fetch_counting(ac, post["id"])
+        detail, few = await fetch_counting(ac, post["id"])
+
+        authors = []
+        for i in range(5):
+            author = (await db.execute(insert(User).values(
+                username=f"full-author-{post['id']}-{i}", email=f"full-author-{post['id']}-{i}@example.com",
+                password="x", active=True,
+            ).returning(User.id))).scalar()
+            authors.append(author)
+        await db.execute(insert(Comment), [{"content": f"Reply {i}", "post_id": post["id"], "author_id": author}
+                                           for i in range(20) for author in authors])
+        await db.commit()
+        full, many = await fetch_counting(ac, post["id"])
+
+    assert few == many == 3
+    assert detail["post"]["id"] == post["id"] and len(detail["comments"]) == 1
+    assert len(full["comments"]) == 50
+    assert {author["id"] for author in full["authors"]} == {test_user["id"], *authors}
+    assert len(full["authors"]) == len({author["id"] for author in full["authors"]})
@@ -0,0 +1,58 @@
+import pytest
+from db.models.user import User
+from utils.auth import create_access_token, get_current_user
+from utils.notifications import NotificationHub
+from utils.principal_cache import Principal, PrincipalCache, principal_cache
+
+
+def make_principal(username):
+    return Principal(id=1, username=username, email=f"{username}@example.com", active=True)
+
+
+def test_cache_evicts_least_recently_used_and_counts_hits():
+    cache = PrincipalCache(maxsize=2, ttl=60)
+    cache.put(make_principal("a"))
+    cache.put(make_principal("b"))
+    assert cache.get("a").username == "a"
+    cache.put(make_principal("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("c").username == "c"
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entries_are_misses():
+    cache = PrincipalCache(maxsize=2, ttl=-1)
+    cache.put(make_principal("a"))
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.anyio
+async def test_invalidation_is_delivered_after_commit(sqlite_session_factory):
+    cache = PrincipalCache(maxsize=10, ttl=60)
+    hub = NotificationHub()
+    hub.subscribe("principal_invalidate", cache.invalidate)
+    cache.put(make_principal("a"))
+
+    async with sqlite_session_factory() as db:
+        db.add(User(username="a", email="a@example.com", password="hashed"))
+        await hub.notify(db, "principal_invalidate", "a")
+        assert cache.get("a") is not None
+        await db.commit()
+
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.anyio
+async def test_cache_miss_releases_its_connection(sqlite_session_factory):
+    principal_cache.clear()
+    async with sqlite_session_factory() as db:
+        db.add(User(username="queued", email="queued@example.com", password="hashed"))
+        await db.commit()
+
+        principal = await get_current_user(create_access_token({"sub": "queued"}), db)
+        assert principal.username == "queued"
+        assert not db.in_transaction()
@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+import pytest
+from fastapi import HTTPException, status
+from httpx import ASGITransport, AsyncClient
+from main import app
+from utils.concurrency_limit import ConcurrencyLimit
+from utils.rate_limit import RateLimit, SqliteBucketStore
+from utils.settings import LOGIN_BURST
+
+
+def test_buckets_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    workers = [SqliteBucketStore(path), SqliteBucketStore(path)]
+
+    assert [workers[i % 2].take("login:1.2.3.4", rate=1, burst=3, now=100) for i in range(3)] == [0, 0, 0]
+    assert workers[0].take("login:1.2.3.4", rate=1, burst=3, now=100) == pytest.approx(1)
+    # A rejected request does not use up tokens.
+    assert workers[1].take("login:1.2.3.4", rate=1, burst=3, now=100.5) == pytest.approx(0.5)
+    assert workers[1].take("login:1.2.3.4", rate=1, burst=3, now=101) == 0
+    assert workers[0].take("login:5.6.7.8", rate=1, burst=3, now=101) == 0
+
+
+@pytest.mark.anyio
+async def test_locked_store_lets_requests_through(tmp_path):
+    path = str(tmp_path / "buckets.sqlite3")
+    store = SqliteBucketStore(path)
+    store.take("warm-up", rate=1, burst=1)
+    store._connection.execute("PRAGMA busy_timeout = 0")
+    # Another worker holding the write lock.
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN EXCLUSIVE")
+    try:
+        limit = RateLimit("write", per_minute=60, burst=1, store=store, enabled=True)
+        await limit.check("1")
+        await limit.check("1")
+    finally:
+        blocker.close()
+
+
+@pytest.mark.anyio
+async def test_login_is_throttled_per_client():
+    credentials = {"username": "nobody", "email": "nobody@example.com", "password": "wrong"}
+    async with AsyncClient(transport=ASGITransport(app=app, client=("10.0.0.1", 1234)), base_url="http://test") as ac:
+        codes = [(await ac.post("/login/", json=credentials)).status_code for _ in range(int(LOGIN_BURST))]
+        throttled = await ac.post("/login/", json=credentials)
+    async with AsyncClient(transport=ASGITransport(app=app, client=("10.0.0.2", 1234)), base_url="http://test") as ac:
+        other_client = await ac.post("/login/", json=credentials)
+
+    assert set(codes) == {status.HTTP_401_UNAUTHORIZED}
+    assert throttled.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(throttled.headers["Retry-After"]) >= 1
+    assert other_client.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.anyio
+async def test_concurrency_limit_queues_then_sheds():
+    limit = ConcurrencyLimit(limit=1, queue_depth=1, timeout=0.05)
+    holder = limit()
+    await holder.__anext__()
+
+    waiter = asyncio.create_task(limit().__anext__())
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as full_queue:
+        await limit().__anext__()
+    assert full_queue.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    with pytest.raises(HTTPException):
+        await waiter
+
+    await holder.aclose()
+    await limit().__anext__()
+    assert limit.waiting == 0
@@ -0,0 +1,84 @@
+from datetime import date
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from db.models.comment_daily_stats import CommentDailyStats
+from db.pool_metrics import InstrumentedAsyncQueuePool
+from db.replicas import ReplicaRouter, WROTE_KEY, is_replica
+
+
+async def database_name(db: AsyncSession) -> str:
+    result = await db.execute(text("SELECT name FROM marker"))
+    return result.scalar()
+
+
+@pytest.fixture
+async def router(tmp_path):
+    urls = []
+    for name in ("primary", "replica"):
+        url = f"sqlite+aiosqlite:///{tmp_path / name}.db"
+        engine = create_async_engine(url)
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE TABLE marker (name TEXT)"))
+            await conn.execute(text("INSERT INTO marker VALUES (:name)"), {"name": name})
+        await engine.dispose()
+        urls.append(url)
+
+    primary_engine = create_async_engine(urls[0])
+    unreachable = f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}"
+    router = ReplicaRouter([unreachable, urls[1]], async_sessionmaker(bind=primary_engine), sticky_seconds=60)
+    yield router
+    await router.dispose()
+    await primary_engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_reads_skip_unreachable_replica(router: ReplicaRouter):
+    for _ in range(3):
+        async with router.session("client") as db:
+            assert await database_name(db) == "replica"
+    # The broken replica stays out of rotation instead of being retried on every request.
+    assert list(router._down_until) == [0]
+
+
+@pytest.mark.anyio
+async def test_recent_writer_reads_from_primary(router: ReplicaRouter):
+    router.record_write("writer")
+    async with router.session("writer") as db:
+        assert await database_name(db) == "primary"
+        assert not is_replica(db)
+    async with router.session("someone else") as db:
+        assert await database_name(db) == "replica"
+        assert is_replica(db)
+
+
+@pytest.mark.anyio
+async def test_falls_back_to_primary_when_no_replica_is_reachable(router: ReplicaRouter):
+    router._down_until[1] = float("inf")
+    async with router.session("client") as db:
+        assert await database_name(db) == "primary"
+
+
+@pytest.mark.anyio
+async def test_reads_skip_replica_with_exhausted_pool(router: ReplicaRouter):
+    busy = ReplicaRouter([str(router.engines[1].url)], router.primary, poolclass=InstrumentedAsyncQueuePool,
+                         pool_size=1, max_overflow=0, pool_timeout=0.1)
+    try:
+        async with busy.session("client") as held:
+            assert await database_name(held) == "replica"
+            async with busy.session("client") as db:
+                assert await database_name(db) == "primary"
+        # A full pool is not an outage, the replica stays in rotation.
+        assert busy._down_until == {}
+    finally:
+        await busy.dispose()
+
+
+@pytest.mark.anyio
+async def test_flush_marks_session_as_written(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        await db.execute(text("SELECT 1"))
+        assert not db.sync_session.info.get(WROTE_KEY)
+        db.add(CommentDailyStats(day=date(2024, 1, 1), total_comments=1, blocked_comments=0))
+        await db.flush()
+        assert db.sync_session.info.get(WROTE_KEY)
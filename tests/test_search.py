@@ -0,0 +1,71 @@
+import pytest
+from fastapi import status
+from httpx import ASGITransport, AsyncClient
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from main import app
+from utils.pagination import NEXT_CURSOR_HEADER
+from utils.search import search
+
+
+@pytest.mark.anyio
+async def test_sqlite_search_ranks_pages_and_reindexes(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="searcher", email="searcher@example.com", password="hashed")
+        other = User(username="other", email="other@example.com", password="hashed")
+        db.add_all([user, other])
+        await db.flush()
+        titled = Post(title="Gardening tomatoes", content="Notes from the allotment", owner_id=user.id)
+        mentioned = Post(title="Weekend", content="Picked tomatoes and beans", owner_id=user.id)
+        foreign = Post(title="Tomatoes", content="Not yours", owner_id=other.id)
+        db.add_all([titled, mentioned, foreign])
+        await db.flush()
+        comment = Comment(content="My tomatoes split", post_id=mentioned.id, author_id=user.id)
+        db.add(comment)
+        await db.commit()
+
+        results, cursor = await search(db, "tomatoes", user.id)
+        assert [(row["kind"], row["id"]) for row in results][0] == ("post", titled.id)
+        assert {(row["kind"], row["id"]) for row in results} == {
+            ("post", titled.id), ("post", mentioned.id), ("comment", comment.id)
+        }
+        assert cursor is None
+
+        first, cursor = await search(db, "tomatoes", user.id, limit=2)
+        second, last = await search(db, "tomatoes", user.id, limit=2, cursor=cursor)
+        assert [row["id"] for row in first + second] == [row["id"] for row in results]
+        assert last is None
+
+        comments, _ = await search(db, "tomatoes", user.id, kind="comment")
+        assert [row["id"] for row in comments] == [comment.id]
+
+        titled.title = "Gardening"
+        titled.content = "Notes"
+        await db.delete(comment)
+        await db.commit()
+        results, _ = await search(db, "tomatoes", user.id)
+        assert [(row["kind"], row["id"]) for row in results] == [("post", mentioned.id)]
+        assert await search(db, '" ', user.id) == ([], None)
+
+
+@pytest.mark.anyio
+async def test_search_route(test_user):
+    headers = {"Authorization": f"Bearer {test_user['token']}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for title in ("Searchable zucchini", "Another zucchini"):
+            response = await ac.post("/posts/", json={"title": title, "content": "Grown in the yard"}, headers=headers)
+            assert response.status_code == status.HTTP_201_CREATED
+
+        response = await ac.get("/search", params={"q": "zucchini", "limit": 1}, headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["kind"] == "post"
+        assert "zucchini" in response.json()[0]["title"].lower()
+
+        following = await ac.get("/search", params={"q": "zucchini", "limit": 1,
+                                                    "cursor": response.headers[NEXT_CURSOR_HEADER]}, headers=headers)
+        assert following.status_code == status.HTTP_200_OK
+        assert following.json()[0]["id"] != response.json()[0]["id"]
+
+        response = await ac.get("/search", params={"q": "zucchini", "cursor": "garbage"}, headers=headers)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
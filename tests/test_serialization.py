@@ -0,0 +1,34 @@
+import json
+from typing import List
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+from sqlalchemy.future import select
+from db.models.comment import Comment
+from db.models.post import Post
+from db.models.user import User
+from schemas.comment_schema import CommentScheme, ResponseStatus
+from utils.serialization import adapter_for, columns_for, json_response, row_dicts
+
+
+@pytest.mark.anyio
+async def test_row_response_matches_orm_response(sqlite_session_factory):
+    async with sqlite_session_factory() as db:
+        user = User(username="writer", email="writer@example.com", password="x")
+        db.add(user)
+        await db.flush()
+        post = Post(title="Post", content="", owner_id=user.id)
+        db.add(post)
+        await db.flush()
+        await db.execute(insert(Comment), [{"content": f"Comment {i}", "post_id": post.id, "author_id": user.id}
+                                           for i in range(3)])
+        objects = (await db.execute(select(Comment).order_by(Comment.id))).scalars().all()
+        rows = (await db.execute(select(*columns_for(CommentScheme, Comment)).order_by(Comment.id))).all()
+
+    expected = jsonable_encoder([ResponseStatus(status="success", data=CommentScheme.model_validate(comment))
+                                 for comment in objects])
+    response = json_response(List[ResponseStatus], [{"status": "success", "data": row} for row in row_dicts(rows)])
+
+    assert response.media_type == "application/json"
+    assert json.loads(response.body) == expected
+    assert adapter_for(List[ResponseStatus]) is adapter_for(List[ResponseStatus])
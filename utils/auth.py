@@ -1,7 +1,8 @@
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from fastapi import Depends, HTTPException, Query, WebSocket, WebSocketException, status
 from db.models.user import User
-from utils.hashing import verify_password
+from utils.hashing import hashing_service
 from db.db_settings import get_db
 from utils.settings import SECRET_KEY, ALGORITHM
 from jwt import encode, decode
@@ -9,19 +10,26 @@ from jwt.exceptions import InvalidTokenError
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordBearer
 from schemas.user_schema import TokenData, UserSchema
+from utils.principal_cache import Principal, principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-def get_user(db: Session, username: str):
-    user = db.query(User).filter(User.username == username).first()
-    return user
+async def get_user(db: AsyncSession, username: str):
+    result = await db.execute(select(User).filter(User.username == username))
+    return result.scalars().first()
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user(db, username)
-    if not user or not verify_password(password, user.password):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
+    if not user:
+        return False
+    verified, new_hash = await hashing_service.verify_and_update(password, user.password)
+    if not verified:
         return False
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     return user
 
 
@@ -32,7 +40,7 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,13 +55,32 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except InvalidTokenError:
         raise credentials_exception
 
-    user = get_user(db, token_data.username)
-    if user is None:
-        raise credentials_exception
-    return user
+    principal = principal_cache.get(token_data.username)
+    if principal is None:
+        user = await get_user(db, token_data.username)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        principal_cache.put(principal)
+        # Hands the connection back, so that a request queued behind a ConcurrencyLimit does not hold it.
+        await db.rollback()
+    return principal
 
 
 async def get_current_active_user(current_user: UserSchema = Depends(get_current_user)):
     if not current_user.active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+
+async def get_websocket_user(websocket: WebSocket, token: str | None = Query(None), db: AsyncSession = Depends(get_db)):
+    """``get_current_active_user`` for WebSocket routes; browsers cannot set headers, so ``?token=`` also works."""
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer":
+        token = credentials
+    if not token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    try:
+        return await get_current_active_user(await get_current_user(token, db))
+    except HTTPException as error:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=error.detail)
@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.models.autoreply_task import AutoreplyTask
+from db.models.comment import Comment
+from db.models.post import Post
+from utils import comment_stats
+from utils.settings import AUTOREPLY_BATCH_SIZE, AUTOREPLY_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class AutoreplyScheduler:
+    """Creates autoreply comments once their due time has passed.
+
+    Pending replies live in the ``autoreply_tasks`` table, so they survive restarts and are shared
+    between workers. In memory the scheduler only keeps a heap of known due times to decide when to
+    wake up; the table is polled every ``poll_interval`` seconds to pick up rows scheduled elsewhere.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, batch_size: int = AUTOREPLY_BATCH_SIZE,
+                 poll_interval: float = AUTOREPLY_POLL_INTERVAL):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._due_times: list[datetime] = []
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def schedule(self, db: AsyncSession, post: Post) -> AutoreplyTask:
+        """Adds an autoreply for ``post`` to the caller's transaction."""
+        task = AutoreplyTask(post_id=post.id, due_at=utcnow() + timedelta(seconds=post.autoreply_delay or 0))
+        db.add(task)
+        return task
+
+    def notify(self, due_at: datetime):
+        """Tells the running loop about a task committed by this process."""
+        heapq.heappush(self._due_times, due_at)
+        self._wakeup.set()
+
+    async def run_due(self) -> int:
+        """Creates the comments for every task that is due and returns how many were inserted."""
+        created = 0
+        while True:
+            async with self.session_factory() as db:
+                now = utcnow()
+                result = await db.execute(
+                    select(AutoreplyTask)
+                    .filter(AutoreplyTask.due_at <= now)
+                    .order_by(AutoreplyTask.due_at)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                tasks = result.scalars().all()
+                if not tasks:
+                    break
+
+                result = await db.execute(select(Post).filter(Post.id.in_({task.post_id for task in tasks})))
+                posts = {post.id: post for post in result.scalars().all()}
+                comments = [
+                    Comment(content=posts[task.post_id].autoreply_msg, post_id=task.post_id,
+                            author_id=posts[task.post_id].owner_id)
+                    for task in tasks if task.post_id in posts
+                ]
+                db.add_all(comments)
+                await db.flush()
+                await comment_stats.record_comments_created(db, comments)
+                await db.execute(delete(AutoreplyTask).filter(AutoreplyTask.id.in_([task.id for task in tasks])))
+                await db.commit()
+                created += len(comments)
+
+            if len(tasks) < self.batch_size:
+                break
+
+        while self._due_times and self._due_times[0] <= now:
+            heapq.heappop(self._due_times)
+        if created:
+            logger.info("Created %s autoreply comments", created)
+        return created
+
+    async def next_due_at(self) -> datetime | None:
+        async with self.session_factory() as db:
+            result = await db.execute(select(func.min(AutoreplyTask.due_at)))
+            return result.scalar()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.run_due()
+                next_due = await self.next_due_at()
+                if next_due is not None and (not self._due_times or next_due < self._due_times[0]):
+                    heapq.heappush(self._due_times, next_due)
+            except Exception:
+                logger.exception("Autoreply scheduler iteration failed")
+
+            timeout = self.poll_interval
+            if self._due_times:
+                timeout = min(timeout, max((self._due_times[0] - utcnow()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+
+autoreply_scheduler = AutoreplyScheduler()
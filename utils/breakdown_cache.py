@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from utils.notifications import notification_hub
+from utils.settings import BREAKDOWN_CACHE_SIZE, BREAKDOWN_CACHE_TTL
+
+INVALIDATION_CHANNEL = "breakdown_invalidate"
+ALL_DAYS = "*"
+
+
+class BreakdownCache:
+    """Bounded LRU of per-day ``(total, blocked)`` comment counts behind ``/breakdown/``.
+
+    Entries are per day rather than per requested window, so overlapping windows share them and a write only
+    drops the days it touched. Closed days read from the primary stay until evicted or invalidated; today, later
+    days and anything read from a replica also expire after ``ttl`` seconds, since a lagging replica can return
+    counts from before the last invalidation.
+    """
+
+    def __init__(self, maxsize: int = BREAKDOWN_CACHE_SIZE, ttl: float = BREAKDOWN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[date, tuple[float | None, tuple[int, int]]] = OrderedDict()
+        # Bumped on every invalidation so that counts read before it are not stored after it.
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_many(self, days: Iterable[date]) -> dict[date, tuple[int, int]]:
+        now = time.monotonic()
+        found = {}
+        for day in days:
+            entry = self._entries.get(day)
+            if entry is None or (entry[0] is not None and entry[0] < now):
+                if entry is not None:
+                    del self._entries[day]
+                self.misses += 1
+                continue
+            self._entries.move_to_end(day)
+            found[day] = entry[1]
+            self.hits += 1
+        return found
+
+    def put_many(self, counts: dict[date, tuple[int, int]], version: int, from_replica: bool = False):
+        if self.maxsize <= 0 or version != self.version:
+            return
+        today = date.today()
+        expires = time.monotonic() + self.ttl
+        for day, value in counts.items():
+            self._entries[day] = (expires if from_replica or day >= today else None, value)
+            self._entries.move_to_end(day)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, payload: str):
+        self.version += 1
+        self.invalidations += 1
+        if payload == ALL_DAYS:
+            self._entries.clear()
+            return
+        for day in payload.split(","):
+            self._entries.pop(date.fromisoformat(day), None)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+breakdown_cache = BreakdownCache()
+notification_hub.subscribe(INVALIDATION_CHANNEL, breakdown_cache.invalidate)
+notification_hub.on_reconnect(breakdown_cache.clear)
+
+
+async def invalidate_days(db: AsyncSession, days: Iterable[date] | None = None):
+    """Drops ``days`` (every day when ``None``) from the cache of every worker once ``db`` commits."""
+    payload = ALL_DAYS if days is None else ",".join(sorted({day.isoformat() for day in days}))
+    if payload:
+        await notification_hub.notify(db, INVALIDATION_CHANNEL, payload)
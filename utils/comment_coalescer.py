@@ -0,0 +1,108 @@
+"""Group commit for ``create_comment``, enabled with ``COMMENT_COALESCING``.
+
+Concurrent inserts are collected for up to ``COMMENT_COALESCE_DELAY_MS`` milliseconds or until
+``COMMENT_COALESCE_MAX_BATCH`` rows are waiting. They are then written with one multi-row
+``INSERT ... RETURNING`` in one transaction, together with their counters and autoreplies, so the whole batch
+pays for a single commit. Each caller gets its own row only after that commit, so a 201 still means the
+comment is durable. If the batch fails, every row is retried alone, so only the callers whose own row is
+rejected see the error.
+"""
+import asyncio
+import contextvars
+import logging
+
+from sqlalchemy import insert
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.models.comment import Comment
+from db.models.post import Post
+from utils import comment_stats
+from utils.autoreply_scheduler import autoreply_scheduler
+from utils.settings import COMMENT_COALESCE_MAX_BATCH, COMMENT_COALESCE_DELAY_MS
+
+logger = logging.getLogger(__name__)
+
+
+class CommentCoalescer:
+    def __init__(self, session_factory=AsyncSessionLocal, max_batch: int = COMMENT_COALESCE_MAX_BATCH,
+                 max_delay_ms: float = COMMENT_COALESCE_DELAY_MS):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._flushes: set[asyncio.Task] = set()
+        self.batches = 0
+        self.rows = 0
+
+    async def insert(self, row: dict) -> Comment:
+        """Queues ``row`` (``Comment`` column values) and returns the committed comment."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._start_flush)
+        return await future
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            # A fresh context, so the batch's statements are not counted against whichever request opened it.
+            task = asyncio.create_task(self._flush(batch), context=contextvars.Context())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def drain(self):
+        """Writes the rows still waiting for their batch and waits for every batch in flight."""
+        self._start_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+
+    async def _flush(self, batch: list[tuple[dict, asyncio.Future]]):
+        try:
+            comments = await self._write([row for row, _ in batch])
+        except Exception as error:
+            if len(batch) == 1:
+                _, future = batch[0]
+                if not future.done():
+                    future.set_exception(error)
+                return
+            logger.warning("Coalesced insert of %s comments failed, retrying them one by one", len(batch),
+                           exc_info=True)
+            for entry in batch:
+                await self._flush([entry])
+            return
+
+        self.batches += 1
+        self.rows += len(comments)
+        for (_, future), comment in zip(batch, comments):
+            if not future.done():
+                future.set_result(comment)
+
+    async def _write(self, rows: list[dict]) -> list[Comment]:
+        async with self.session_factory() as db:
+            result = await db.scalars(insert(Comment).returning(Comment, sort_by_parameter_order=True), rows)
+            comments = result.all()
+            await comment_stats.record_comments_created(db, comments)
+
+            posts = await db.execute(select(Post).filter(Post.id.in_({comment.post_id for comment in comments})))
+            posts = {post.id: post for post in posts.scalars().all()}
+            # One autoreply per comment, as when each comment is committed on its own.
+            autoreplies = [
+                autoreply_scheduler.schedule(db, posts[comment.post_id])
+                for comment in comments if posts[comment.post_id].autoreply
+            ]
+            await db.commit()
+
+        for autoreply in autoreplies:
+            autoreply_scheduler.notify(autoreply.due_at)
+        return comments
+
+
+comment_coalescer = CommentCoalescer()
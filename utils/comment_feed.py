@@ -0,0 +1,276 @@
+"""Live comment feed behind ``/posts/{post_id}/comments/stream`` (SSE) and ``/posts/{post_id}/comments/ws``.
+
+Every path that creates comments counts them with ``comment_stats.record_comments_created``, which also calls
+``publish`` inside the writing transaction. The comments reach the feed of every worker through
+``notification_hub`` once that transaction commits (``LISTEN``/``NOTIFY`` on Postgres, in-process otherwise),
+so subscribers only ever see committed comments, whichever worker wrote them. A notification carries the
+comments themselves when they fit in a ``NOTIFY`` payload, otherwise only their ids, and each worker with
+subscribers to the post then reads them once for all of its subscribers.
+
+Each subscriber has its own queue of ``COMMENT_FEED_QUEUE_SIZE`` comments, and a writer never waits for it.
+When a subscriber falls that far behind its queue is dropped and the subscriber catches up from the database,
+up to ``COMMENT_FEED_BACKFILL_LIMIT`` comments. Beyond that it gets a ``resync`` event whose ``cursor`` pages
+through the missed comments with ``GET /posts/{post_id}/comments``, while the stream goes on with the comments
+committed after them. Comments may be repeated after a catch-up, clients should dedupe by ``id``.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Iterable, NamedTuple
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.models.comment import Comment
+from schemas.comment_schema import CommentScheme
+from utils.notifications import notification_hub
+from utils.pagination import encode_cursor
+from utils.serialization import columns_for, row_dicts
+from utils.settings import COMMENT_FEED_QUEUE_SIZE, COMMENT_FEED_BACKFILL_LIMIT, COMMENT_FEED_HEARTBEAT
+
+logger = logging.getLogger(__name__)
+
+FEED_CHANNEL = "comment_feed"
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+MAX_PAYLOAD_BYTES = 7900
+IDS_PER_MESSAGE = 500
+
+CLOSED = object()
+RESYNC = object()
+
+
+class FeedEvent(NamedTuple):
+    kind: str
+    id: int | None
+    data: str
+
+
+class Subscription:
+    def __init__(self, post_id: int, queue_size: int):
+        self.post_id = post_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        # Smallest id dropped since the last catch-up, ``None`` while nothing is missing.
+        self.missed_from: int | None = None
+        self.last_id: int | None = None
+
+    def put(self, comment_id: int, data: str) -> bool:
+        """Queues a comment without waiting; returns ``False`` when the subscriber has fallen behind."""
+        if self.missed_from is None:
+            try:
+                self.queue.put_nowait((comment_id, data))
+                return True
+            except asyncio.QueueFull:
+                pass
+        self.miss(comment_id)
+        return False
+
+    def miss(self, comment_id: int):
+        """Drops what is queued so that the subscriber catches up from the database from ``comment_id`` on."""
+        if self.missed_from is not None:
+            self.missed_from = min(self.missed_from, comment_id)
+            return
+        dropped = [comment_id]
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is CLOSED:
+                self.queue.put_nowait(CLOSED)
+                return
+            dropped.append(item[0])
+        self.missed_from = min(dropped)
+        self.queue.put_nowait(RESYNC)
+
+    def close(self):
+        while self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSED)
+
+
+def comment_data(comment) -> dict:
+    return {name: getattr(comment, name) for name in CommentScheme.model_fields}
+
+
+class CommentFeed:
+    def __init__(self, session_factory=AsyncSessionLocal, queue_size: int = COMMENT_FEED_QUEUE_SIZE,
+                 backfill_limit: int = COMMENT_FEED_BACKFILL_LIMIT, heartbeat: float = COMMENT_FEED_HEARTBEAT):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.backfill_limit = backfill_limit
+        self.heartbeat = heartbeat
+        self._subscribers: dict[int, set[Subscription]] = defaultdict(set)
+        self._fetches: set[asyncio.Task] = set()
+        self.delivered = 0
+        self.dropped = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    @staticmethod
+    def payloads(comments: Iterable) -> list[str]:
+        """One notification per post, with the comments inline when they fit and only their ids otherwise.
+
+        Comments blocked by moderation are left out, they are only ever shown to their author.
+        """
+        per_post = defaultdict(list)
+        for comment in comments:
+            if not comment.is_blocked:
+                per_post[comment.post_id].append(comment)
+        payloads = []
+        for post_id, post_comments in per_post.items():
+            comment_dicts = [comment_data(comment) for comment in post_comments]
+            payload = json.dumps({"post_id": post_id, "comments": comment_dicts})
+            if len(payload.encode()) <= MAX_PAYLOAD_BYTES:
+                payloads.append(payload)
+                continue
+            ids = [comment.id for comment in post_comments]
+            payloads.extend(
+                json.dumps({"post_id": post_id, "ids": ids[start:start + IDS_PER_MESSAGE]})
+                for start in range(0, len(ids), IDS_PER_MESSAGE)
+            )
+        return payloads
+
+    async def publish(self, db: AsyncSession, comments: Iterable[Comment]):
+        """Sends flushed ``comments`` to the subscribers of every worker once ``db`` commits."""
+        for payload in self.payloads(comments):
+            await notification_hub.notify(db, FEED_CHANNEL, payload)
+
+    def dispatch(self, payload: str):
+        message = json.loads(payload)
+        post_id = message["post_id"]
+        if not self._subscribers.get(post_id):
+            return
+        if "comments" in message:
+            self._deliver(post_id, message["comments"])
+            return
+        # Not counted against whichever request committed the comments.
+        task = asyncio.get_running_loop().create_task(self._fetch(post_id, message["ids"]),
+                                                      context=contextvars.Context())
+        self._fetches.add(task)
+        task.add_done_callback(self._fetches.discard)
+
+    async def _fetch(self, post_id: int, ids: list[int]):
+        try:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    select(*columns_for(CommentScheme, Comment))
+                    .filter(Comment.id.in_(ids), Comment.is_blocked.is_(False))
+                    .order_by(Comment.id)
+                )
+                comments = row_dicts(result.all())
+        except Exception:
+            logger.exception("Reading %s comments of post %s for the feed failed", len(ids), post_id)
+            for subscription in self._subscribers.get(post_id, ()):
+                subscription.miss(min(ids))
+            return
+        self._deliver(post_id, comments)
+
+    def _deliver(self, post_id: int, comments: list[dict]):
+        encoded = [(comment["id"], json.dumps(comment)) for comment in comments]
+        for subscription in self._subscribers.get(post_id, ()):
+            for comment_id, data in encoded:
+                if subscription.put(comment_id, data):
+                    self.delivered += 1
+                else:
+                    self.dropped += 1
+
+    @asynccontextmanager
+    async def subscribe(self, post_id: int) -> AsyncIterator[Subscription]:
+        subscription = Subscription(post_id, self.queue_size)
+        self._subscribers[post_id].add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers[post_id]
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[post_id]
+
+    async def events(self, subscription: Subscription, last_id: int | None = None) -> AsyncIterator[FeedEvent | None]:
+        """The subscriber's events, starting with the comments after ``last_id`` when it is given.
+
+        Yields ``None`` after ``heartbeat`` seconds without events, and ends once the feed is closed.
+        """
+        # Comments already sent by a catch-up, and the newest id a ``resync`` told the client to refetch.
+        sent: set[int] = set()
+        covered_through = 0
+        if last_id is None:
+            # Only comments from now on, but a listener reconnect must know where "now" was to catch up from.
+            async with self.session_factory() as db:
+                subscription.last_id = await self._newest_id(db, subscription.post_id)
+        else:
+            subscription.last_id = last_id
+            events, covered_through = await self._backfill(subscription.post_id, last_id, sent)
+            for event in events:
+                subscription.last_id = event.id or covered_through
+                yield event
+
+        while True:
+            try:
+                item = await asyncio.wait_for(subscription.queue.get(), self.heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is CLOSED:
+                return
+            if item is RESYNC:
+                # Comments committed from here on are queued again; earlier ones are already in the database.
+                missed_from, subscription.missed_from = subscription.missed_from, None
+                sent.clear()
+                events, covered_through = await self._backfill(subscription.post_id, missed_from - 1, sent)
+                for event in events:
+                    subscription.last_id = event.id or covered_through
+                    yield event
+                continue
+            comment_id, data = item
+            if comment_id > covered_through and comment_id not in sent:
+                subscription.last_id = comment_id
+                yield FeedEvent("comment", comment_id, data)
+
+    async def _backfill(self, post_id: int, last_id: int, sent: set[int]) -> tuple[list[FeedEvent], int]:
+        """The comments after ``last_id``, or a ``resync`` event when there are more than ``backfill_limit``.
+
+        Adds the ids it returns to ``sent`` and also returns the newest id the client has to refetch, or 0.
+        """
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(*columns_for(CommentScheme, Comment))
+                .filter(Comment.post_id == post_id, Comment.id > last_id, Comment.is_blocked.is_(False))
+                .order_by(Comment.id)
+                .limit(self.backfill_limit + 1)
+            )
+            comments = row_dicts(result.all())
+            if len(comments) > self.backfill_limit:
+                data = json.dumps({"post_id": post_id, "cursor": encode_cursor(last_id)})
+                return [FeedEvent("resync", None, data)], await self._newest_id(db, post_id)
+        sent.update(comment["id"] for comment in comments)
+        return [FeedEvent("comment", comment["id"], json.dumps(comment)) for comment in comments], 0
+
+    @staticmethod
+    async def _newest_id(db: AsyncSession, post_id: int) -> int:
+        return (await db.execute(select(func.max(Comment.id)).filter(Comment.post_id == post_id))).scalar() or 0
+
+    def resync(self):
+        """Makes every subscriber catch up from the database, after notifications from other workers were lost.
+
+        Subscribers still reading their starting position are skipped, that position already covers the gap.
+        """
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                if subscription.last_id is not None:
+                    subscription.miss(subscription.last_id + 1)
+
+    def close(self):
+        """Ends every open stream, e.g. when the worker shuts down; clients reconnect with their last id."""
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                subscription.close()
+
+
+comment_feed = CommentFeed()
+notification_hub.subscribe(FEED_CHANNEL, comment_feed.dispatch)
+notification_hub.on_reconnect(comment_feed.resync)
@@ -0,0 +1,229 @@
+"""Monthly partitions of ``comments`` on Postgres.
+
+The partitioning migration turns ``comments`` into a table range-partitioned by ``created_at``, with one
+``comments_yYYYYmMM`` partition per month and a ``comments_default`` partition for rows that have no month
+partition yet. ``PartitionMaintainer`` runs in every worker. It keeps ``COMMENTS_PARTITIONS_AHEAD`` future
+months created, moves any rows that landed in the default partition into their own month, and with
+``COMMENTS_RETENTION_MONTHS`` set drops whole months that have fallen out of retention. Dropping a partition
+costs the same however many comments it holds; there is no mass ``DELETE``. Range filters on ``created_at``,
+such as the ``/breakdown/`` fallback count, are pruned to the partitions they cover by Postgres.
+
+Every function is a no-op when ``comments`` is not partitioned, e.g. on SQLite or on a ``create_all`` database.
+``python -m utils.comment_partitions maintain`` runs one maintenance pass by hand.
+"""
+import argparse
+import asyncio
+import logging
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_settings import AsyncSessionLocal
+from db.models.comment import Comment
+from utils.breakdown_cache import invalidate_days
+from utils.settings import COMMENTS_PARTITIONS_AHEAD, COMMENTS_RETENTION_MONTHS, COMMENTS_PARTITION_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "comments_default"
+PARTITION_NAME = re.compile(r"^comments_y(\d{4})m(\d{2})$")
+# Any key works as long as it is only used here; taken for the transaction so that workers do not race.
+LOCK_KEY = 0x636f6d6d
+# Copied when rows move between partitions; search_vector is generated and cannot be written.
+COLUMNS = ", ".join(column.name for column in Comment.__table__.columns)
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"comments_y{month.year:04d}m{month.month:02d}"
+
+
+async def is_partitioned(db: AsyncSession) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    result = await db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('comments'))"
+    ))
+    return result.scalar()
+
+
+async def month_partitions(db: AsyncSession) -> list[date]:
+    """Months that have their own partition, oldest first."""
+    result = await db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass('comments')"
+    ))
+    months = []
+    for name in result.scalars():
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+async def _create_partition(db: AsyncSession, month: date):
+    name, lower, upper = partition_name(month), month, add_months(month, 1)
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_month = f"created_at >= '{lower}' AND created_at < '{upper}'"
+    stray = await db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})"))
+    if not stray.scalar():
+        await db.execute(text(f"CREATE TABLE {name} PARTITION OF comments {bounds}"))
+        return
+    # A new partition may not overlap rows kept in the default one, so those rows are moved over first.
+    await db.execute(text(f"ALTER TABLE comments DETACH PARTITION {DEFAULT_PARTITION}"))
+    await db.execute(text(f"CREATE TABLE {name} PARTITION OF comments {bounds}"))
+    await db.execute(text(f"INSERT INTO {name} ({COLUMNS}) SELECT {COLUMNS} FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    await db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_month}"))
+    await db.execute(text(f"ALTER TABLE comments ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = COMMENTS_PARTITIONS_AHEAD,
+                            today: date | None = None) -> list[str]:
+    """Creates the partitions of this month, the next ``months_ahead`` ones and of every month with rows in the
+    default partition, then commits. Returns the names of the partitions created."""
+    if not await is_partitioned(db):
+        return []
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+    current = month_start(today or date.today())
+    wanted = {add_months(current, offset) for offset in range(months_ahead + 1)}
+    stray = await db.execute(text(f"SELECT DISTINCT date_trunc('month', created_at) FROM {DEFAULT_PARTITION}"))
+    wanted.update(month.date() for month in stray.scalars())
+
+    created = []
+    for month in sorted(wanted - set(await month_partitions(db))):
+        await _create_partition(db, month)
+        created.append(partition_name(month))
+    await db.commit()
+    if created:
+        logger.info("Created comment partitions %s", ", ".join(created))
+    return created
+
+
+async def _forget_comments(db: AsyncSession, relation: str, cutoff: date):
+    """Takes the comments of ``relation`` older than ``cutoff`` out of the post counters."""
+    await db.execute(text(f"""
+        UPDATE posts
+        SET comment_count = posts.comment_count - gone.total,
+            blocked_comment_count = posts.blocked_comment_count - gone.blocked,
+            last_comment_at = CASE WHEN posts.last_comment_at < :cutoff THEN NULL ELSE posts.last_comment_at END,
+            updated_at = now()
+        FROM (
+            SELECT post_id, count(*) AS total, count(*) FILTER (WHERE is_blocked) AS blocked
+            FROM {relation}
+            WHERE created_at < :cutoff
+            GROUP BY post_id
+        ) AS gone
+        WHERE posts.id = gone.post_id
+    """), {"cutoff": datetime.combine(cutoff, datetime.min.time())})
+
+
+async def drop_comments_before(db: AsyncSession, cutoff: date) -> list[str]:
+    """Removes every comment created before ``cutoff`` (a first of the month) and returns the partitions dropped.
+
+    Each month partition is dropped in its own transaction, so a long run holds the lock on ``comments`` for
+    one drop at a time. The post counters and daily rollups of the dropped comments go with them.
+    """
+    if not await is_partitioned(db):
+        return []
+    dropped = []
+    while True:
+        # Listed again under the lock, so two workers never subtract the same partition twice.
+        await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+        expired = [month for month in await month_partitions(db) if add_months(month, 1) <= cutoff]
+        if not expired:
+            break
+        name = partition_name(expired[0])
+        await _forget_comments(db, name, cutoff)
+        await db.execute(text(f"DROP TABLE {name}"))
+        await db.commit()
+        dropped.append(name)
+
+    await _forget_comments(db, DEFAULT_PARTITION, cutoff)
+    strays = await db.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE created_at < :cutoff"),
+                              {"cutoff": datetime.combine(cutoff, datetime.min.time())})
+    rollups = await db.execute(text("DELETE FROM comment_daily_stats WHERE day < :cutoff"), {"cutoff": cutoff})
+    if dropped or strays.rowcount or rollups.rowcount:
+        await invalidate_days(db)
+    await db.commit()
+    if dropped:
+        logger.info("Dropped comment partitions %s", ", ".join(dropped))
+    return dropped
+
+
+async def apply_retention(db: AsyncSession, months: int = COMMENTS_RETENTION_MONTHS,
+                          today: date | None = None) -> list[str]:
+    """Keeps this month and the ``months`` before it; ``months=0`` keeps everything."""
+    if months <= 0:
+        return []
+    return await drop_comments_before(db, add_months(month_start(today or date.today()), -months))
+
+
+class PartitionMaintainer:
+    """Runs ``ensure_partitions`` and ``apply_retention`` on start and every ``interval`` seconds."""
+
+    def __init__(self, session_factory=AsyncSessionLocal, interval: float = COMMENTS_PARTITION_CHECK_INTERVAL):
+        self.session_factory = session_factory
+        self.interval = interval
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def run_once(self):
+        async with self.session_factory() as db:
+            await ensure_partitions(db)
+            await apply_retention(db)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Comment partition maintenance failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+
+partition_maintainer = PartitionMaintainer()
+
+
+async def _main(args):
+    async with AsyncSessionLocal() as db:
+        created = await ensure_partitions(db, args.months_ahead)
+        dropped = await apply_retention(db, args.retention_months)
+    print(f"Created {len(created)} comment partitions, dropped {len(dropped)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of the comments table.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    maintain = subparsers.add_parser("maintain", help="create upcoming partitions and apply retention")
+    maintain.add_argument("--months-ahead", type=int, default=COMMENTS_PARTITIONS_AHEAD)
+    maintain.add_argument("--retention-months", type=int, default=COMMENTS_RETENTION_MONTHS,
+                          help="months kept before the current one, 0 keeps everything")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,212 @@
+"""Daily comment rollup used by ``/breakdown/``.
+
+A row in ``comment_daily_stats`` means the day is covered: its counters are kept in step with comment
+inserts, deletes and block changes in the same transaction as the write. Days without a row are counted
+straight from ``comments``. Run ``python -m utils.comment_stats backfill`` once after deploying so that
+historical days (and the partially tracked deploy day) get authoritative rows.
+
+Every write hook also invalidates the days it touched in the per-day ``BreakdownCache`` of each worker and
+keeps the denormalized counters on ``posts`` (``utils.post_counters``) in step. New comments are also published
+to the live comment feed (``utils.comment_feed``).
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from sqlalchemy import case, func, literal_column, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.replicas import is_replica
+from db.models.comment import Comment
+from db.models.comment_daily_stats import CommentDailyStats
+from utils import post_counters
+from utils.breakdown_cache import BreakdownCache, invalidate_days
+from utils.comment_feed import comment_feed
+
+stats_table = CommentDailyStats.__table__
+
+
+def _dialect_name(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def _insert(db: AsyncSession):
+    return postgresql.insert(stats_table) if _dialect_name(db) == "postgresql" else sqlite.insert(stats_table)
+
+
+def _day_expr(db: AsyncSession):
+    if _dialect_name(db) == "postgresql":
+        # A literal keeps the SELECT and GROUP BY expressions identical, bound parameters would differ.
+        return func.date_trunc(literal_column("'day'"), Comment.created_at)
+    return func.date(Comment.created_at)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    return value
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _days(start: date, end: date) -> list[date]:
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+async def _add_to_day(db: AsyncSession, day: date, total: int, blocked: int):
+    stmt = _insert(db).values(day=day, total_comments=total, blocked_comments=blocked)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[stats_table.c.day],
+        set_={
+            "total_comments": stats_table.c.total_comments + stmt.excluded.total_comments,
+            "blocked_comments": stats_table.c.blocked_comments + stmt.excluded.blocked_comments,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def _subtract_from_day(db: AsyncSession, day: date, total: int, blocked: int):
+    # Only covered days are touched, a missing row must keep falling back to the live count.
+    await db.execute(
+        update(stats_table)
+        .where(stats_table.c.day == day)
+        .values(
+            total_comments=stats_table.c.total_comments - total,
+            blocked_comments=stats_table.c.blocked_comments - blocked,
+        )
+    )
+
+
+async def record_comments_created(db: AsyncSession, comments: Iterable[Comment]):
+    """Counts flushed ``comments`` in the rollup, inside the caller's transaction."""
+    comments = list(comments)
+    await post_counters.record_comments_created(db, comments)
+    per_day = defaultdict(lambda: [0, 0])
+    for comment in comments:
+        counters = per_day[comment.created_at.date()]
+        counters[0] += 1
+        counters[1] += int(bool(comment.is_blocked))
+    for day in sorted(per_day):
+        await _add_to_day(db, day, *per_day[day])
+    await invalidate_days(db, per_day)
+    await comment_feed.publish(db, comments)
+
+
+async def record_comment_created(db: AsyncSession, comment: Comment):
+    await record_comments_created(db, [comment])
+
+
+async def record_comment_deleted(db: AsyncSession, comment: Comment):
+    await post_counters.record_comment_deleted(db, comment)
+    await _subtract_from_day(db, comment.created_at.date(), 1, int(bool(comment.is_blocked)))
+    await invalidate_days(db, [comment.created_at.date()])
+
+
+async def record_comment_block_changed(db: AsyncSession, comment: Comment):
+    """Applies a flip of ``comment.is_blocked`` that is about to be committed."""
+    await post_counters.record_comment_block_changed(db, comment)
+    await _subtract_from_day(db, comment.created_at.date(), 0, 1 if not comment.is_blocked else -1)
+    await invalidate_days(db, [comment.created_at.date()])
+
+
+async def _count_comments(db: AsyncSession, start: date | None, end: date | None) -> dict[date, tuple[int, int]]:
+    day_col = _day_expr(db)
+    query = select(
+        day_col,
+        func.count(),
+        func.count(case((Comment.is_blocked, 1))),
+    ).group_by(day_col)
+    if start is not None:
+        query = query.filter(Comment.created_at >= _start_of(start))
+    if end is not None:
+        query = query.filter(Comment.created_at < _start_of(end + timedelta(days=1)))
+    result = await db.execute(query)
+    return {_as_date(day): (total, blocked) for day, total, blocked in result.all()}
+
+
+async def _load_days(db: AsyncSession, start: date, end: date) -> dict[date, tuple[int, int]]:
+    result = await db.execute(
+        select(stats_table.c.day, stats_table.c.total_comments, stats_table.c.blocked_comments)
+        .where(stats_table.c.day >= start, stats_table.c.day <= end)
+    )
+    summary = {_as_date(day): (total, blocked) for day, total, blocked in result.all()}
+
+    missing = [day for day in _days(start, end) if day not in summary]
+    if missing:
+        counted = await _count_comments(db, missing[0], missing[-1])
+        summary.update({day: counted.get(day, (0, 0)) for day in missing})
+    return summary
+
+
+async def daily_breakdown(db: AsyncSession, start: date, end: date, cache: BreakdownCache | None = None) -> list[dict]:
+    """Returns per-day totals for ``start``..``end`` (inclusive), skipping days without comments.
+
+    With a ``cache``, only the days it does not hold are read from the database.
+    """
+    if cache is None:
+        summary = await _load_days(db, start, end)
+    else:
+        version = cache.version
+        summary = cache.get_many(_days(start, end))
+        missing = [day for day in _days(start, end) if day not in summary]
+        if missing:
+            loaded = await _load_days(db, missing[0], missing[-1])
+            cache.put_many(loaded, version, from_replica=is_replica(db))
+            summary.update(loaded)
+
+    return [
+        {"date": str(day), "total_comments": total, "blocked_comments": blocked}
+        for day, (total, blocked) in sorted(summary.items())
+        if total
+    ]
+
+
+async def backfill(db: AsyncSession, start: date | None = None, end: date | None = None) -> int:
+    """Recomputes the rollup rows for ``start``..``end`` from ``comments`` and returns the number of days written."""
+    counted = await _count_comments(db, start, end)
+    if start is None:
+        start = min(counted, default=date.today())
+    if end is None:
+        end = date.today()
+
+    rows = [
+        {"day": day, "total_comments": counted.get(day, (0, 0))[0], "blocked_comments": counted.get(day, (0, 0))[1]}
+        for day in _days(start, end)
+    ]
+    stmt = _insert(db)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[stats_table.c.day],
+        set_={
+            "total_comments": stmt.excluded.total_comments,
+            "blocked_comments": stmt.excluded.blocked_comments,
+        },
+    )
+    if rows:
+        await db.execute(stmt, rows)
+    await invalidate_days(db)
+    await db.commit()
+    return len(rows)
+
+
+async def _main(args):
+    async with AsyncSessionLocal() as db:
+        days = await backfill(db, args.date_from, args.date_to)
+    print(f"Backfilled comment stats for {days} days")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the comment_daily_stats rollup.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = subparsers.add_parser("backfill", help="recompute rollup rows from the comments table")
+    backfill_parser.add_argument("--date-from", type=date.fromisoformat, default=None)
+    backfill_parser.add_argument("--date-to", type=date.fromisoformat, default=None)
+    asyncio.run(_main(parser.parse_args()))
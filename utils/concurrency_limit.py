@@ -0,0 +1,46 @@
+import asyncio
+
+from fastapi import HTTPException, status
+
+from utils.settings import WRITE_CONCURRENCY, WRITE_QUEUE_DEPTH, WRITE_QUEUE_TIMEOUT
+
+
+class ConcurrencyLimit:
+    """Route dependency that lets at most ``limit`` requests run at once in this worker.
+
+    Up to ``queue_depth`` more wait for a slot, each for at most ``timeout`` seconds. Anything beyond that, or a
+    request whose wait runs out, gets 503 before it opens a database session. Give every route its own instance.
+    """
+
+    def __init__(self, limit: int = WRITE_CONCURRENCY, queue_depth: int = WRITE_QUEUE_DEPTH,
+                 timeout: float = WRITE_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(limit)
+
+    def _overloaded(self):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later",
+            headers={"Retry-After": str(max(1, round(self.timeout)))},
+        )
+
+    async def __call__(self):
+        if self._slots.locked():
+            if self.waiting >= self.queue_depth:
+                raise self._overloaded()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise self._overloaded()
+            finally:
+                self.waiting -= 1
+        else:
+            await self._slots.acquire()
+        try:
+            yield
+        finally:
+            self._slots.release()
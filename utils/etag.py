@@ -0,0 +1,61 @@
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+ETAG_HEADER = "ETag"
+
+
+def make_etag(count: int, id_sum: int, last_modified: Optional[datetime]) -> str:
+    # Ids catch rows entering or leaving the result, max(updated_at) catches edits to rows that stayed.
+    stamp = last_modified.isoformat() if last_modified is not None else ""
+    digest = hashlib.blake2b(f"{count}:{id_sum}:{stamp}".encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def rows_etag(rows: Iterable) -> Optional[str]:
+    """ETag of loaded rows or ORM objects exposing ``id`` and ``updated_at``, ``None`` for an empty result."""
+    rows = list(rows)
+    if not rows:
+        return None
+    return make_etag(len(rows), sum(row.id for row in rows), max(row.updated_at for row in rows))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison.
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+async def not_modified(request: Request, db: AsyncSession, query, id_column, updated_column) -> Optional[Response]:
+    """Answers ``304`` when the client's ``If-None-Match`` still matches what ``query`` would return.
+
+    Only ids and ``updated_at`` of the result are aggregated, so the full rows are neither loaded nor
+    serialized. Returns ``None`` when the route has to build the response, including for an empty result.
+    """
+    if not request.headers.get("if-none-match"):
+        return None
+    page = query.with_only_columns(id_column, updated_column).subquery()
+    count, id_sum, last_modified = (await db.execute(
+        select(func.count(), func.sum(page.c[id_column.key]), func.max(page.c[updated_column.key]))
+    )).one()
+    if not count:
+        return None
+    etag = make_etag(count, int(id_sum), last_modified)
+    if not etag_matches(request, etag):
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag})
+
+
+def set_etag(response: Response, rows: Iterable):
+    etag = rows_etag(rows)
+    if etag is not None:
+        response.headers[ETAG_HEADER] = etag
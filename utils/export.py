@@ -0,0 +1,28 @@
+from typing import AsyncIterator, Type
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from db.db_settings import replica_router
+from utils.settings import EXPORT_BATCH_SIZE
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _ndjson_rows(query, schema: Type[BaseModel], client: str, batch_size: int) -> AsyncIterator[bytes]:
+    # The request session is closed before the body is sent, so the stream owns its session.
+    async with replica_router.session(client) as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield b"".join(schema.model_validate(row, from_attributes=True).model_dump_json().encode() + b"\n" for row in rows)
+
+
+def ndjson_response(query, schema: Type[BaseModel], client: str,
+                    batch_size: int = EXPORT_BATCH_SIZE) -> StreamingResponse:
+    """Streams ``query`` as one JSON object per line, fetching ``batch_size`` rows at a time from a server-side cursor.
+
+    Each batch is only fetched after the previous one was handed to the server, so a slow client slows the
+    cursor down instead of making the worker buffer the whole result. Like ``get_read_db``, the rows come from a
+    replica unless ``client`` (see ``client_key``) wrote recently.
+    """
+    return StreamingResponse(_ndjson_rows(query, schema, client, batch_size), media_type=NDJSON_MEDIA_TYPE)
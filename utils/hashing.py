@@ -1,11 +1,76 @@
-from passlib.context import CryptContext
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
 
+from utils.settings import BCRYPT_ROUNDS, HASHING_WORKERS, HASHING_QUEUE_DEPTH
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Hashes made with a different cost factor are reported by verify_and_update and rehashed on login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 
-def get_password_hash(password):
+def _hash(password):
     return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashingService:
+    """Runs bcrypt on a process pool so it never blocks the event loop.
+
+    At most ``max_queue`` calls may be running or waiting at once; anything above that is rejected
+    with 503 right away instead of piling up behind a login burst.
+    """
+
+    def __init__(self, max_workers: int = HASHING_WORKERS, max_queue: int = HASHING_QUEUE_DEPTH):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password checks in progress, try again later",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run(_verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+hashing_service = HashingService()
+
+
+async def verify_password(plain_password, hashed_password):
+    verified, _ = await hashing_service.verify_and_update(plain_password, hashed_password)
+    return verified
+
+
+async def get_password_hash(password):
+    return await hashing_service.hash(password)
@@ -0,0 +1,89 @@
+"""Startup warm-up, shutdown drain and the state reported by ``/health/live`` and ``/health/ready``.
+
+The app lifespan calls ``warm_up`` before a worker accepts traffic and ``drain`` once it stops. ``utils.server``
+marks the state as draining as soon as a worker is asked to stop, so that readiness fails while in-flight
+requests finish and load balancers move traffic to other workers.
+"""
+import asyncio
+import logging
+from datetime import date, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from db.db_settings import AsyncSessionLocal, async_engine, replica_router
+from utils.autoreply_scheduler import autoreply_scheduler
+from utils.breakdown_cache import breakdown_cache
+from utils.comment_coalescer import comment_coalescer
+from utils.comment_feed import comment_feed
+from utils.comment_stats import daily_breakdown
+from utils.moderation import moderation_service
+from utils.settings import DB_POOL_SIZE, SERVER_WARMUP_BREAKDOWN_DAYS, SERVER_GRACEFUL_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class ServerState:
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+
+    def start_draining(self):
+        self.draining = True
+        self.ready = False
+
+
+server_state = ServerState()
+
+
+async def ping(engine: AsyncEngine):
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def warm_pool(engine: AsyncEngine, connections: int = DB_POOL_SIZE):
+    """Opens ``connections`` pooled connections at once, so the first requests do not pay for the handshakes."""
+    await asyncio.gather(*(ping(engine) for _ in range(connections)))
+
+
+async def warm_up():
+    """Fills the connection pools and caches; a failing step is logged and does not stop the worker."""
+    steps = {
+        "database pool": lambda: warm_pool(async_engine),
+        "replica pools": lambda: asyncio.gather(*(warm_pool(engine) for engine in replica_router.engines)),
+        "breakdown cache": _warm_breakdown_cache,
+        # Starts a moderation worker and builds its term matcher.
+        "moderation pool": lambda: moderation_service.check(["warm-up"]),
+    }
+    for name, step in steps.items():
+        try:
+            await step()
+        except Exception:
+            logger.exception("Warming up the %s failed", name)
+    server_state.ready = True
+
+
+async def _warm_breakdown_cache():
+    if SERVER_WARMUP_BREAKDOWN_DAYS <= 0:
+        return
+    today = date.today()
+    async with AsyncSessionLocal() as db:
+        await daily_breakdown(db, today - timedelta(days=SERVER_WARMUP_BREAKDOWN_DAYS - 1), today,
+                              cache=breakdown_cache)
+
+
+async def drain(timeout: float = SERVER_GRACEFUL_TIMEOUT):
+    """Ends live comment streams, commits coalesced comments still in flight, stops the autoreply loop after its
+    current batch and sends the replies that are already due. Replies due later stay in ``autoreply_tasks`` for
+    the next start.
+    """
+    server_state.start_draining()
+    comment_feed.close()
+    await comment_coalescer.drain()
+    await autoreply_scheduler.stop()
+    try:
+        await asyncio.wait_for(autoreply_scheduler.run_due(), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Due autoreplies were not all sent within %s seconds", timeout)
+    except Exception:
+        logger.exception("Sending due autoreplies on shutdown failed")
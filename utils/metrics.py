@@ -0,0 +1,283 @@
+"""Per-route request latency and SQL statement counts, exported in the Prometheus text format on ``/metrics``.
+
+Every worker counts in memory. With ``METRICS_DIR`` set, each worker also writes its counters to its own file
+there every ``METRICS_FLUSH_INTERVAL`` seconds and on shutdown, and ``/metrics`` adds up the files of all
+workers, so whichever worker answers a scrape reports the whole server (other workers up to one interval
+late). Files of stopped workers are kept so that counters never go backwards; empty the directory before
+starting the server, like ``PROMETHEUS_MULTIPROC_DIR``.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from utils.settings import METRICS_DIR, METRICS_FLUSH_INTERVAL, METRICS_DEBUG_HEADERS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+BACKGROUND_ROUTE = "background"
+UNMATCHED_ROUTE = "unmatched"
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Time-Ms"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = defaultdict(float)
+
+    def inc(self, key: tuple, amount: float = 1):
+        self.values[key] += amount
+
+    def dump(self) -> list:
+        return [[*key, value] for key, value in self.values.items()]
+
+    def load(self, rows: list):
+        for *key, value in rows:
+            self.values[tuple(key)] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key in sorted(self.values):
+            lines.append(f"{self.name}{_labels(self.labels, key)} {_number(self.values[key])}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per key: one count per bucket plus the +Inf bucket (not cumulative), then the sum.
+        self.values: dict[tuple, list[float]] = {}
+
+    def _entry(self, key: tuple) -> list[float]:
+        entry = self.values.get(key)
+        if entry is None:
+            entry = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        return entry
+
+    def observe(self, key: tuple, value: float):
+        entry = self._entry(key)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def dump(self) -> list:
+        return [[*key, entry] for key, entry in self.values.items()]
+
+    def load(self, rows: list):
+        for *key, values in rows:
+            entry = self._entry(tuple(key))
+            for index, value in enumerate(values):
+                entry[index] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key in sorted(self.values):
+            entry = self.values[key]
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), entry[:-1]):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _number(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, le)} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(entry[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {_number(cumulative)}")
+        return lines
+
+
+class RequestStats:
+    """SQL statements run on behalf of the current request."""
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Metrics:
+    def __init__(self, directory: str = METRICS_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        route = ("method", "route")
+        self.requests = Counter("http_requests_total", "HTTP requests by route and status.", (*route, "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Time from request to the last body chunk.",
+                                 route, LATENCY_BUCKETS)
+        self.queries_per_request = Histogram("db_queries_per_request", "SQL statements executed per request.",
+                                             route, QUERY_COUNT_BUCKETS)
+        self.queries = Counter("db_queries_total", "SQL statements executed, background work under route "
+                                                   f"\"{BACKGROUND_ROUTE}\".", route)
+        self.query_time = Counter("db_query_duration_seconds_total", "Time spent executing SQL statements.", route)
+        self.families = {family.name: family for family in (
+            self.requests, self.latency, self.queries_per_request, self.queries, self.query_time
+        )}
+
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self._file = self.directory / f"{os.getpid()}-{time.time_ns()}.json" if self.directory else None
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        self.requests.inc((method, route, str(status)))
+        self.latency.observe(key, seconds)
+        self.queries_per_request.observe(key, stats.queries)
+        self.queries.inc(key, stats.queries)
+        self.query_time.inc(key, stats.db_time)
+
+    def observe_query(self, seconds: float):
+        stats = _request_stats.get()
+        if stats is None:
+            key = ("", BACKGROUND_ROUTE)
+            self.queries.inc(key)
+            self.query_time.inc(key, seconds)
+        else:
+            stats.queries += 1
+            stats.db_time += seconds
+
+    def dump(self) -> dict:
+        return {name: family.dump() for name, family in self.families.items()}
+
+    def load(self, snapshot: dict):
+        for name, rows in snapshot.items():
+            if name in self.families:
+                self.families[name].load(rows)
+
+    def flush(self):
+        if self._file is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self._file.with_suffix(".tmp")
+        temporary.write_text(json.dumps(self.dump()))
+        os.replace(temporary, self._file)
+
+    def render(self) -> str:
+        """Exposition text for this process, or for every worker sharing ``directory``."""
+        source = self
+        if self.directory is not None:
+            self.flush()
+            source = Metrics(directory="")
+            for path in self.directory.glob("*.json"):
+                try:
+                    source.load(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    logger.warning("Skipping unreadable metrics file %s", path)
+        lines = []
+        for family in source.families.values():
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Writing metrics to %s failed", self._file)
+
+    async def start(self):
+        if self._task is None and self._file is not None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """Times each HTTP request and attributes the SQL statements it runs to its route template."""
+
+    def __init__(self, app, registry: Metrics = metrics, debug_headers: bool = METRICS_DEBUG_HEADERS):
+        self.app = app
+        self.registry = registry
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_stats(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.debug_headers:
+                    # Statements run while a streaming body is sent are not included.
+                    headers = MutableHeaders(scope=message)
+                    headers.append(QUERY_COUNT_HEADER, str(stats.queries))
+                    headers.append(QUERY_TIME_HEADER, f"{stats.db_time * 1000:.3f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            self.registry.observe_request(scope["method"], getattr(route, "path", UNMATCHED_ROUTE), status,
+                                          time.perf_counter() - started, stats)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    metrics.observe_query(time.perf_counter() - conn.info["query_started"].pop())
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_query_timer(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        metrics.observe_query(time.perf_counter() - started.pop())
@@ -0,0 +1,105 @@
+"""Comment moderation: sets ``comments.is_blocked`` when a comment contains a term from ``MODERATION_TERMS_FILE``.
+
+Checks run on a process pool through ``utils.term_matcher``. Every worker rebuilds its matcher when the term
+file changes, so editing the file takes effect on the next check without a restart. New and edited comments
+are checked by the comment routes. ``python -m utils.moderation rescan`` re-checks the existing comments after
+the list changed, committing every ``MODERATION_RESCAN_BATCH_SIZE`` comments.
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.models.comment import Comment
+from utils import comment_stats
+from utils.settings import MODERATION_TERMS_FILE, MODERATION_WORKERS, MODERATION_RESCAN_BATCH_SIZE
+from utils.term_matcher import check
+
+
+class ModerationService:
+    """Checks texts against the term list; ``max_workers=0`` checks in the calling process instead of a pool."""
+
+    def __init__(self, terms_file: str = MODERATION_TERMS_FILE, max_workers: int = MODERATION_WORKERS):
+        self.terms_file = terms_file
+        self.max_workers = max_workers
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def check(self, texts: list[str | None]) -> list[bool]:
+        """Whether each of ``texts`` contains a listed term, in order."""
+        texts = [text or "" for text in texts]
+        if not self.terms_file or not texts:
+            return [False] * len(texts)
+        if self.max_workers <= 0:
+            return check(self.terms_file, texts)
+
+        # Large batches are split so that every worker gets a share.
+        size = math.ceil(len(texts) / self.max_workers)
+        loop = asyncio.get_running_loop()
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(self._get_executor(), check, self.terms_file, texts[start:start + size])
+            for start in range(0, len(texts), size)
+        ))
+        return [blocked for chunk in chunks for blocked in chunk]
+
+    async def is_blocked(self, text: str | None) -> bool:
+        return (await self.check([text]))[0]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+moderation_service = ModerationService()
+
+
+async def rescan(db: AsyncSession, service: ModerationService = moderation_service,
+                 batch_size: int = MODERATION_RESCAN_BATCH_SIZE) -> tuple[int, int]:
+    """Re-checks every comment in id order and returns how many were scanned and how many changed."""
+    scanned = changed = 0
+    last_id = 0
+    while True:
+        result = await db.execute(select(Comment).filter(Comment.id > last_id).order_by(Comment.id).limit(batch_size))
+        comments = result.scalars().all()
+        if not comments:
+            return scanned, changed
+        flags = await service.check([comment.content for comment in comments])
+        for comment, blocked in zip(comments, flags):
+            if comment.is_blocked != blocked:
+                comment.is_blocked = blocked
+                await comment_stats.record_comment_block_changed(db, comment)
+                changed += 1
+        scanned += len(comments)
+        last_id = comments[-1].id
+        await db.commit()
+        db.expunge_all()
+
+
+async def _main(args):
+    try:
+        async with AsyncSessionLocal() as db:
+            scanned, changed = await rescan(db, batch_size=args.batch_size)
+    finally:
+        moderation_service.shutdown()
+    print(f"Rescanned {scanned} comments, {changed} changed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moderate comments against the term list.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rescan_parser = subparsers.add_parser("rescan", help="re-check every existing comment against the term list")
+    rescan_parser.add_argument("--batch-size", type=int, default=MODERATION_RESCAN_BATCH_SIZE,
+                               help="comments checked and committed per transaction")
+    asyncio.run(_main(parser.parse_args()))
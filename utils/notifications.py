@@ -0,0 +1,163 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable
+
+import asyncpg
+from sqlalchemy import event, func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session as OrmSession
+
+from db.db_settings import async_engine
+from utils.settings import NOTIFICATIONS_CHECK_INTERVAL, NOTIFICATIONS_MAX_RETRY_DELAY
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "pending_notifications"
+
+
+class NotificationHub:
+    """Delivers small invalidation messages to every worker after the writing transaction commits.
+
+    On Postgres a message is sent with ``pg_notify`` inside the caller's transaction and received through
+    ``LISTEN`` by every started hub, this process included. When the hub is not listening (other databases,
+    the app lifespan has not run, or the listening connection is down), messages are also dispatched
+    in-process once the session commits. Handlers are plain callables taking the payload string and must be
+    subscribed before ``start()``.
+
+    The listening connection is a dedicated one, outside the app pool. A background task watches it (termination
+    callback plus a ping every ``check_interval`` seconds) and reconnects with exponential backoff. Messages from
+    other workers are lost while it is down, so the ``on_reconnect`` callbacks run once it listens again, for
+    caches to drop what they may have missed.
+    """
+
+    def __init__(self, engine: AsyncEngine = async_engine, check_interval: float = NOTIFICATIONS_CHECK_INTERVAL,
+                 max_retry_delay: float = NOTIFICATIONS_MAX_RETRY_DELAY):
+        self.engine = engine
+        self.check_interval = check_interval
+        self.max_retry_delay = max_retry_delay
+        self._handlers: dict[str, list[Callable[[str], None]]] = defaultdict(list)
+        self._reconnect_callbacks: list[Callable[[], None]] = []
+        self._connection = None
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.listening = False
+        self.reconnects = 0
+
+    def subscribe(self, channel: str, handler: Callable[[str], None]):
+        self._handlers[channel].append(handler)
+
+    def on_reconnect(self, callback: Callable[[], None]):
+        self._reconnect_callbacks.append(callback)
+
+    def dispatch(self, channel: str, payload: str):
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Notification handler for %s failed", channel)
+
+    async def notify(self, db: AsyncSession, channel: str, payload: str):
+        if db.get_bind().dialect.name == "postgresql":
+            await db.execute(select(func.pg_notify(channel, payload)))
+        if not self.listening:
+            db.sync_session.info.setdefault(PENDING_KEY, []).append((self, channel, payload))
+
+    def _on_notification(self, connection, pid, channel, payload):
+        self.dispatch(channel, payload)
+
+    def _on_termination(self, connection):
+        self._lost.set()
+
+    async def _listen(self):
+        url = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = await asyncpg.connect(url)
+        try:
+            for channel in self._handlers:
+                await connection.add_listener(channel, self._on_notification)
+        except BaseException:
+            await connection.close()
+            raise
+        connection.add_termination_listener(self._on_termination)
+        self._lost.clear()
+        self._connection = connection
+        self.listening = True
+
+    def _disconnect(self):
+        self.listening = False
+        connection, self._connection = self._connection, None
+        if connection is not None and not connection.is_closed():
+            connection.terminate()
+
+    async def _alive(self) -> bool:
+        try:
+            await asyncio.wait_for(self._lost.wait(), self.check_interval)
+            return False
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.wait_for(self._connection.fetchval("SELECT 1"), self.check_interval)
+            return True
+        except Exception:
+            return False
+
+    async def _supervise(self):
+        delay = 1.0
+        while True:
+            if not self.listening:
+                try:
+                    await self._listen()
+                except Exception as error:
+                    logger.warning("Listening for notifications failed (%s), retrying in %ss", error, delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.max_retry_delay)
+                    continue
+                delay = 1.0
+                self.reconnects += 1
+                logger.info("Listening for notifications again")
+                for callback in self._reconnect_callbacks:
+                    try:
+                        callback()
+                    except Exception:
+                        logger.exception("Notification reconnect callback failed")
+            if not await self._alive():
+                logger.warning("Lost the notification connection, falling back to in-process delivery")
+                self._disconnect()
+
+    async def start(self):
+        if self._task is not None or self.engine.dialect.name != "postgresql":
+            return
+        # The first attempt is made here, so that a worker normally listens before it serves traffic.
+        try:
+            await self._listen()
+        except Exception:
+            logger.warning("Listening for notifications failed, retrying in the background", exc_info=True)
+        self._task = asyncio.create_task(self._supervise())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+        self.listening = False
+
+
+notification_hub = NotificationHub()
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _dispatch_pending(session):
+    for hub, channel, payload in session.info.pop(PENDING_KEY, []):
+        hub.dispatch(channel, payload)
+
+
+@event.listens_for(OrmSession, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,44 @@
+import base64
+import binascii
+import json
+from typing import Optional
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_keyset(**values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_keyset(cursor: str, **types) -> dict:
+    """Decodes a cursor made by ``encode_keyset``, converting each named value with its type."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return {key: convert(values[key]) for key, convert in types.items()}
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(last_id: int) -> str:
+    return encode_keyset(id=last_id)
+
+
+def decode_cursor(cursor: str) -> int:
+    return decode_keyset(cursor, id=int)["id"]
+
+
+def paginate(query, id_column, cursor: Optional[str], skip: int, limit: int):
+    """Orders ``query`` by ``id_column`` and pages it by cursor when one is given, by offset otherwise."""
+    if cursor is not None:
+        query = query.filter(id_column > decode_cursor(cursor))
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(id_column).limit(limit)
+
+
+def set_next_cursor(response: Response, items, limit: int):
+    """Points the client at the page after ``items``; a short page means there is nothing left."""
+    if items and len(items) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(items[-1].id)
@@ -0,0 +1,107 @@
+"""Denormalized ``comment_count``, ``blocked_comment_count`` and ``last_comment_at`` on ``posts``.
+
+The counters are changed with relative ``UPDATE`` statements inside the writer's transaction (called from the
+``utils.comment_stats`` write hooks), so concurrent writers never lose an increment. Each update also bumps
+``posts.updated_at``, which keeps post ETags honest. ``python -m utils.post_counters backfill`` recomputes them
+from ``comments``, e.g. for rows written by a version of the API that did not maintain them yet.
+"""
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import case, func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.db_settings import AsyncSessionLocal
+from db.models.comment import Comment
+from db.models.post import Post
+
+posts_table = Post.__table__
+
+
+def _latest(created_at: datetime):
+    return case(
+        (or_(posts_table.c.last_comment_at.is_(None), posts_table.c.last_comment_at < created_at), created_at),
+        else_=posts_table.c.last_comment_at,
+    )
+
+
+async def record_comments_created(db: AsyncSession, comments: Iterable[Comment]):
+    per_post = defaultdict(lambda: [0, 0, None])
+    for comment in comments:
+        counters = per_post[comment.post_id]
+        counters[0] += 1
+        counters[1] += int(bool(comment.is_blocked))
+        counters[2] = comment.created_at if counters[2] is None else max(counters[2], comment.created_at)
+    # A fixed order keeps two bulk writers from locking the same posts the other way round.
+    for post_id in sorted(per_post):
+        total, blocked, latest = per_post[post_id]
+        await db.execute(
+            update(posts_table)
+            .where(posts_table.c.id == post_id)
+            .values(
+                comment_count=posts_table.c.comment_count + total,
+                blocked_comment_count=posts_table.c.blocked_comment_count + blocked,
+                last_comment_at=_latest(latest),
+            )
+        )
+
+
+async def record_comment_deleted(db: AsyncSession, comment: Comment):
+    """Call before the delete is flushed; ``last_comment_at`` is recomputed only if ``comment`` was the latest."""
+    remaining_latest = (
+        select(func.max(Comment.created_at))
+        .where(Comment.post_id == comment.post_id, Comment.id != comment.id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(posts_table)
+        .where(posts_table.c.id == comment.post_id)
+        .values(
+            comment_count=posts_table.c.comment_count - 1,
+            blocked_comment_count=posts_table.c.blocked_comment_count - int(bool(comment.is_blocked)),
+            last_comment_at=case(
+                (posts_table.c.last_comment_at <= comment.created_at, remaining_latest),
+                else_=posts_table.c.last_comment_at,
+            ),
+        )
+    )
+
+
+async def record_comment_block_changed(db: AsyncSession, comment: Comment):
+    await db.execute(
+        update(posts_table)
+        .where(posts_table.c.id == comment.post_id)
+        .values(blocked_comment_count=posts_table.c.blocked_comment_count + (1 if comment.is_blocked else -1))
+    )
+
+
+async def backfill(db: AsyncSession) -> int:
+    """Recomputes every post's counters from ``comments`` and returns the number of posts updated."""
+    per_post = select(func.count()).where(Comment.post_id == posts_table.c.id)
+    result = await db.execute(
+        update(posts_table).values(
+            comment_count=per_post.scalar_subquery(),
+            blocked_comment_count=per_post.where(Comment.is_blocked).scalar_subquery(),
+            last_comment_at=select(func.max(Comment.created_at)).where(Comment.post_id == posts_table.c.id)
+            .scalar_subquery(),
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def _main(args):
+    async with AsyncSessionLocal() as db:
+        posts = await backfill(db)
+    print(f"Backfilled comment counters for {posts} posts")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the denormalized comment counters on posts.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="recompute the counters of every post from the comments table")
+    asyncio.run(_main(parser.parse_args()))
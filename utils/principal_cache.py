@@ -0,0 +1,84 @@
+import time
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models.user import User
+from utils.notifications import notification_hub
+from utils.settings import AUTH_CACHE_SIZE, AUTH_CACHE_TTL
+
+INVALIDATION_CHANNEL = "principal_invalidate"
+
+
+class Principal:
+    """The parts of a ``User`` that authenticated routes read from ``current_user``."""
+    __slots__ = ("id", "username", "email", "active")
+
+    def __init__(self, id: int, username: str, email: str, active: bool):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.active = active
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.email, user.active)
+
+
+class PrincipalCache:
+    """Bounded LRU of verified principals keyed by the token subject, each entry expiring after ``ttl`` seconds."""
+
+    def __init__(self, maxsize: int = AUTH_CACHE_SIZE, ttl: float = AUTH_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, Principal]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, username: str) -> Principal | None:
+        entry = self._entries.get(username)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[username]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(username)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, principal: Principal):
+        if self.maxsize <= 0:
+            return
+        self._entries[principal.username] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(principal.username)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username: str):
+        if self._entries.pop(username, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+principal_cache = PrincipalCache()
+notification_hub.subscribe(INVALIDATION_CHANNEL, principal_cache.invalidate)
+notification_hub.on_reconnect(principal_cache.clear)
+
+
+async def invalidate_principal(db: AsyncSession, username: str):
+    """Drops ``username`` here right away and, once ``db`` commits, in every worker."""
+    principal_cache.invalidate(username)
+    await notification_hub.notify(db, INVALIDATION_CHANNEL, username)
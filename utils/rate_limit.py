@@ -0,0 +1,134 @@
+"""Token-bucket rate limits whose state is shared by every worker on the host.
+
+The buckets live in a SQLite file (``RATE_LIMIT_DB``). Refilling and taking a token is a single upsert, so it
+is atomic across processes without holding a lock between statements. A rejected request gets 429 with a
+``Retry-After`` header and does not use up tokens. Limits are applied as route dependencies, keyed by client
+address (``limit_by_client``) or by the authenticated user (``limit_by_user``), so they run before the
+endpoint touches the database or the hashing pool. The upsert runs in the thread pool, and when the file stays
+locked past its timeout the request is let through with a warning rather than failed.
+"""
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from fastapi import Depends, HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+
+from db.models.user import User
+from utils.auth import get_current_active_user
+from utils.settings import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_DB, LOGIN_RATE_PER_MINUTE, LOGIN_BURST, SIGNUP_RATE_PER_MINUTE, SIGNUP_BURST,
+    WRITE_RATE_PER_MINUTE, WRITE_BURST,
+)
+
+logger = logging.getLogger(__name__)
+
+# Buckets untouched for this long are full for any configured limit, so their rows can go.
+IDLE_SECONDS = 3600
+PRUNE_EVERY = 1000
+
+TAKE = """
+    INSERT INTO buckets (key, tokens, updated, allowed) VALUES (:key, :burst - :cost, :now, 1)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = CASE WHEN min(:burst, tokens + (:now - updated) * :rate) >= :cost
+                      THEN min(:burst, tokens + (:now - updated) * :rate) - :cost
+                      ELSE min(:burst, tokens + (:now - updated) * :rate) END,
+        allowed = min(:burst, tokens + (:now - updated) * :rate) >= :cost,
+        updated = :now
+    RETURNING tokens, allowed
+"""
+
+
+class SqliteBucketStore:
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._opened_path: str | None = None
+        self._takes = 0
+        # One connection per worker, used from the thread pool one call at a time.
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._opened_path != self.path:
+            if self._connection is not None:
+                self._connection.close()
+            # Autocommit: every statement is its own transaction. Losing buckets in a crash only resets limits.
+            connection = sqlite3.connect(self.path, isolation_level=None, timeout=1, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, allowed INTEGER NOT NULL) "
+                "WITHOUT ROWID"
+            )
+            self._connection, self._opened_path = connection, self.path
+        return self._connection
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1, now: float | None = None) -> float:
+        """Takes ``cost`` tokens from ``key``'s bucket (``rate`` tokens per second, at most ``burst``).
+
+        Returns 0 when they were taken, otherwise the seconds until the bucket holds enough.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            connection = self._connect()
+            tokens, allowed = connection.execute(
+                TAKE, {"key": key, "rate": rate, "burst": burst, "cost": cost, "now": now}
+            ).fetchone()
+
+            self._takes += 1
+            if self._takes % PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,))
+        return 0.0 if allowed else (cost - tokens) / rate
+
+
+rate_limit_store = SqliteBucketStore()
+
+
+class RateLimit:
+    def __init__(self, scope: str, per_minute: float, burst: float, store: SqliteBucketStore = rate_limit_store,
+                 enabled: bool = RATE_LIMIT_ENABLED):
+        self.scope = scope
+        self.rate = per_minute / 60
+        self.burst = burst
+        self.store = store
+        self.enabled = enabled
+
+    async def check(self, identity: str):
+        if not self.enabled:
+            return
+        try:
+            # The upsert can wait up to a second on another worker's write lock.
+            retry_after = await run_in_threadpool(self.store.take, f"{self.scope}:{identity}", self.rate, self.burst)
+        except sqlite3.OperationalError:
+            logger.warning("Rate limit store unavailable, letting the %s request through", self.scope, exc_info=True)
+            return
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+
+def client_address(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_client(limit: RateLimit):
+    async def dependency(request: Request):
+        await limit.check(client_address(request))
+    return dependency
+
+
+def limit_by_user(limit: RateLimit):
+    async def dependency(current_user: User = Depends(get_current_active_user)):
+        await limit.check(str(current_user.id))
+    return dependency
+
+
+login_limit = limit_by_client(RateLimit("login", LOGIN_RATE_PER_MINUTE, LOGIN_BURST))
+signup_limit = limit_by_client(RateLimit("signup", SIGNUP_RATE_PER_MINUTE, SIGNUP_BURST))
+write_limit = limit_by_user(RateLimit("write", WRITE_RATE_PER_MINUTE, WRITE_BURST))
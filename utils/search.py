@@ -0,0 +1,90 @@
+"""Ranked full-text search over the current user's posts and comments.
+
+Results are ordered by rank, best first, then by kind and id, and paged with a keyset cursor on those three
+values. Postgres ranks with ``ts_rank`` over the generated ``search_vector`` columns, SQLite with ``bm25`` over
+the FTS5 tables (see ``db.search_index``).
+"""
+from typing import Optional
+
+from sqlalchemy import and_, column, func, literal, literal_column, null, or_, table, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from db.models.comment import Comment
+from db.models.post import Post
+from utils.pagination import decode_keyset, encode_keyset
+
+KINDS = ("post", "comment")
+# A title hit counts ten times a body hit in bm25, as setweight 'A' against 'B' roughly does in ts_rank.
+SQLITE_POST_WEIGHTS = (10.0, 1.0)
+
+
+def _postgres_queries(q: str, user_id: int) -> dict:
+    query = func.websearch_to_tsquery(literal_column("'english'"), q)
+    post_vector = literal_column("posts.search_vector")
+    comment_vector = literal_column("comments.search_vector")
+    return {
+        "post": select(
+            literal("post").label("kind"), Post.id.label("id"), Post.id.label("post_id"), Post.title.label("title"),
+            Post.content.label("content"), func.ts_rank(post_vector, query).label("rank"),
+        ).where(Post.owner_id == user_id, post_vector.op("@@")(query)),
+        "comment": select(
+            literal("comment").label("kind"), Comment.id.label("id"), Comment.post_id.label("post_id"),
+            null().label("title"), Comment.content.label("content"), func.ts_rank(comment_vector, query).label("rank"),
+        ).where(Comment.author_id == user_id, comment_vector.op("@@")(query)),
+    }
+
+
+def _fts_match(q: str) -> str:
+    # Every word becomes a quoted FTS5 string, so user input cannot use (or break) the query syntax.
+    return " ".join('"{}"'.format(word.replace('"', '""')) for word in q.split())
+
+
+def _sqlite_queries(q: str, user_id: int) -> dict:
+    posts_fts = table("posts_fts", column("rowid"))
+    comments_fts = table("comments_fts", column("rowid"))
+    match = _fts_match(q)
+    return {
+        "post": select(
+            literal("post").label("kind"), Post.id.label("id"), Post.id.label("post_id"), Post.title.label("title"),
+            Post.content.label("content"),
+            (-func.bm25(literal_column("posts_fts"), *SQLITE_POST_WEIGHTS)).label("rank"),
+        ).select_from(posts_fts.join(Post.__table__, Post.id == posts_fts.c.rowid))
+        .where(literal_column("posts_fts").op("MATCH")(match), Post.owner_id == user_id),
+        "comment": select(
+            literal("comment").label("kind"), Comment.id.label("id"), Comment.post_id.label("post_id"),
+            null().label("title"), Comment.content.label("content"),
+            (-func.bm25(literal_column("comments_fts"))).label("rank"),
+        ).select_from(comments_fts.join(Comment.__table__, Comment.id == comments_fts.c.rowid))
+        .where(literal_column("comments_fts").op("MATCH")(match), Comment.author_id == user_id),
+    }
+
+
+async def search(db: AsyncSession, q: str, user_id: int, kind: Optional[str] = None, limit: int = 10,
+                 cursor: Optional[str] = None) -> tuple[list[dict], Optional[str]]:
+    """Returns one page of results and the cursor of the next page, ``None`` after the last one."""
+    if db.get_bind().dialect.name == "postgresql":
+        queries = _postgres_queries(q, user_id)
+    else:
+        if not _fts_match(q):
+            return [], None
+        queries = _sqlite_queries(q, user_id)
+
+    selected = [queries[name] for name in KINDS if kind in (None, name)]
+    results = (union_all(*selected) if len(selected) > 1 else selected[0]).subquery()
+    query = select(results)
+    if cursor is not None:
+        after = decode_keyset(cursor, rank=float, kind=str, id=int)
+        query = query.where(or_(
+            results.c.rank < after["rank"],
+            and_(results.c.rank == after["rank"], results.c.kind > after["kind"]),
+            and_(results.c.rank == after["rank"], results.c.kind == after["kind"], results.c.id > after["id"]),
+        ))
+    query = query.order_by(results.c.rank.desc(), results.c.kind, results.c.id).limit(limit)
+
+    rows = [dict(row._mapping) for row in (await db.execute(query)).all()]
+    next_cursor = None
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_keyset(rank=last["rank"], kind=last["kind"], id=last["id"])
+    return rows, next_cursor
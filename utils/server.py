@@ -0,0 +1,89 @@
+"""Runs the API with uvicorn, ``python main.py``.
+
+``SERVER_MODE=development`` (the default) keeps the single auto-reloading process with debug logs.
+``SERVER_MODE=production`` starts ``SERVER_WORKERS`` worker processes (one per available core when 0). It uses
+uvloop and httptools when they are installed (``pip install uvicorn[standard]``). On SIGTERM or SIGINT each
+worker keeps serving for ``SERVER_DRAIN_SECONDS`` while ``/health/ready`` answers 503, so that load balancers
+stop routing to it. It then stops accepting connections and waits up to ``SERVER_GRACEFUL_TIMEOUT`` seconds
+for in-flight requests before the app shuts down; live comment streams are ended at that point, and their
+clients reconnect to another worker. A second signal skips the drain.
+"""
+import importlib.util
+import logging
+import os
+import time
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from utils.comment_feed import comment_feed
+from utils.lifecycle import server_state
+from utils.settings import (
+    SERVER_MODE, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_DRAIN_SECONDS, SERVER_GRACEFUL_TIMEOUT,
+    SERVER_KEEPALIVE_TIMEOUT, SERVER_LOG_LEVEL,
+)
+
+APP = "main:app"
+
+logger = logging.getLogger("uvicorn.error")
+
+
+def available_cores() -> int:
+    # The affinity mask honours taskset and cpusets, os.cpu_count() does not.
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def production_options(workers: int = SERVER_WORKERS) -> dict:
+    return {
+        "host": SERVER_HOST,
+        "port": SERVER_PORT,
+        "workers": workers or available_cores(),
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "log_level": SERVER_LOG_LEVEL,
+        "proxy_headers": True,
+        "timeout_keep_alive": SERVER_KEEPALIVE_TIMEOUT,
+        "timeout_graceful_shutdown": SERVER_GRACEFUL_TIMEOUT,
+    }
+
+
+class DrainingServer(uvicorn.Server):
+    """A uvicorn server that fails readiness for ``drain_seconds`` before it starts shutting down."""
+
+    def __init__(self, config: uvicorn.Config, drain_seconds: float = SERVER_DRAIN_SECONDS):
+        super().__init__(config)
+        self.drain_seconds = drain_seconds
+        self.drain_deadline: float | None = None
+
+    def handle_exit(self, sig, frame):
+        if self.drain_deadline is None and self.drain_seconds > 0:
+            server_state.start_draining()
+            self.drain_deadline = time.monotonic() + self.drain_seconds
+            return
+        super().handle_exit(sig, frame)
+
+    async def on_tick(self, counter: int) -> bool:
+        if self.drain_deadline is not None and time.monotonic() >= self.drain_deadline:
+            self.should_exit = True
+        return await super().on_tick(counter)
+
+    async def shutdown(self, sockets=None):
+        # Open comment streams would otherwise hold the graceful shutdown until it times out.
+        comment_feed.close()
+        await super().shutdown(sockets)
+
+
+def run(mode: str = SERVER_MODE):
+    if mode != "production":
+        uvicorn.run(APP, host=SERVER_HOST, port=SERVER_PORT, reload=True, log_level="debug")
+        return
+
+    config = uvicorn.Config(APP, **production_options())
+    server = DrainingServer(config)
+    logger.info("Starting %s workers with the %s loop and the %s parser", config.workers, config.loop, config.http)
+    if config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
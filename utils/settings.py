@@ -1,17 +1,91 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
 PROJECT_NAME = os.getenv("PROJECT_NAME")
 
+SERVER_MODE = os.getenv('SERVER_MODE', 'development')
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', 8081))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 0))
+SERVER_DRAIN_SECONDS = float(os.getenv('SERVER_DRAIN_SECONDS', 5))
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv('SERVER_GRACEFUL_TIMEOUT', 30))
+SERVER_KEEPALIVE_TIMEOUT = int(os.getenv('SERVER_KEEPALIVE_TIMEOUT', 5))
+SERVER_LOG_LEVEL = os.getenv('SERVER_LOG_LEVEL', 'info')
+SERVER_WARMUP_BREAKDOWN_DAYS = int(os.getenv('SERVER_WARMUP_BREAKDOWN_DAYS', 30))
+
 DB_DRIVER = os.getenv('DB_DRIVER')
+DB_ASYNC_DRIVER = os.getenv('DB_ASYNC_DRIVER', 'postgresql+asyncpg')
 DB_HOST = os.getenv('DB_HOST')
 DB_USERNAME = os.getenv('DB_USERNAME')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_PORT = os.getenv('DB_PORT')
 DB_DATABASE = os.getenv('DB_DATABASE')
+# Full URLs override the DB_* parts above, e.g. to point benchmarks at a throwaway SQLite file.
+DB_URL = os.getenv('DB_URL')
+DB_ASYNC_URL = os.getenv('DB_ASYNC_URL')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', -1))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'false').lower() == 'true'
+DB_POOL_SLOW_CHECKOUT_MS = float(os.getenv('DB_POOL_SLOW_CHECKOUT_MS', 100))
+DB_REPLICA_URLS = [url.strip() for url in os.getenv('DB_REPLICA_URLS', '').split(',') if url.strip()]
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+DB_REPLICA_RETRY_SECONDS = float(os.getenv('DB_REPLICA_RETRY_SECONDS', 30))
 
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
-ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES')
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES')
+
+AUTOREPLY_BATCH_SIZE = int(os.getenv('AUTOREPLY_BATCH_SIZE', 500))
+AUTOREPLY_POLL_INTERVAL = float(os.getenv('AUTOREPLY_POLL_INTERVAL', 5))
+
+NOTIFICATIONS_CHECK_INTERVAL = float(os.getenv('NOTIFICATIONS_CHECK_INTERVAL', 30))
+NOTIFICATIONS_MAX_RETRY_DELAY = float(os.getenv('NOTIFICATIONS_MAX_RETRY_DELAY', 30))
+
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 10000))
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+
+BREAKDOWN_CACHE_SIZE = int(os.getenv('BREAKDOWN_CACHE_SIZE', 4096))
+BREAKDOWN_CACHE_TTL = float(os.getenv('BREAKDOWN_CACHE_TTL', 5))
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+HASHING_WORKERS = int(os.getenv('HASHING_WORKERS', os.cpu_count() or 1))
+HASHING_QUEUE_DEPTH = int(os.getenv('HASHING_QUEUE_DEPTH', 64))
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Shared by every worker on the host; keep it on a local disk.
+RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', os.path.join(tempfile.gettempdir(), 'fastapitest-rate-limits.sqlite3'))
+LOGIN_RATE_PER_MINUTE = float(os.getenv('LOGIN_RATE_PER_MINUTE', 10))
+LOGIN_BURST = float(os.getenv('LOGIN_BURST', 10))
+SIGNUP_RATE_PER_MINUTE = float(os.getenv('SIGNUP_RATE_PER_MINUTE', 5))
+SIGNUP_BURST = float(os.getenv('SIGNUP_BURST', 5))
+WRITE_RATE_PER_MINUTE = float(os.getenv('WRITE_RATE_PER_MINUTE', 120))
+WRITE_BURST = float(os.getenv('WRITE_BURST', 60))
+WRITE_CONCURRENCY = int(os.getenv('WRITE_CONCURRENCY', DB_POOL_SIZE))
+WRITE_QUEUE_DEPTH = int(os.getenv('WRITE_QUEUE_DEPTH', 64))
+WRITE_QUEUE_TIMEOUT = float(os.getenv('WRITE_QUEUE_TIMEOUT', 5))
+
+COMMENTS_BULK_LIMIT = int(os.getenv('COMMENTS_BULK_LIMIT', 500))
+COMMENT_COALESCING = os.getenv('COMMENT_COALESCING', 'false').lower() == 'true'
+COMMENT_COALESCE_MAX_BATCH = int(os.getenv('COMMENT_COALESCE_MAX_BATCH', 100))
+COMMENT_COALESCE_DELAY_MS = float(os.getenv('COMMENT_COALESCE_DELAY_MS', 2))
+COMMENT_FEED_QUEUE_SIZE = int(os.getenv('COMMENT_FEED_QUEUE_SIZE', 256))
+COMMENT_FEED_BACKFILL_LIMIT = int(os.getenv('COMMENT_FEED_BACKFILL_LIMIT', 500))
+COMMENT_FEED_HEARTBEAT = float(os.getenv('COMMENT_FEED_HEARTBEAT', 15))
+COMMENTS_PARTITIONS_AHEAD = int(os.getenv('COMMENTS_PARTITIONS_AHEAD', 3))
+COMMENTS_RETENTION_MONTHS = int(os.getenv('COMMENTS_RETENTION_MONTHS', 0))
+COMMENTS_PARTITION_CHECK_INTERVAL = float(os.getenv('COMMENTS_PARTITION_CHECK_INTERVAL', 3600))
+
+MODERATION_TERMS_FILE = os.getenv('MODERATION_TERMS_FILE', '')
+MODERATION_WORKERS = int(os.getenv('MODERATION_WORKERS', 2))
+MODERATION_RESCAN_BATCH_SIZE = int(os.getenv('MODERATION_RESCAN_BATCH_SIZE', 1000))
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
+
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_DEBUG_HEADERS = os.getenv('METRICS_DEBUG_HEADERS', 'false').lower() == 'true'
@@ -0,0 +1,106 @@
+"""Aho-Corasick matcher for the moderation term list.
+
+The automaton is built once per version of the term file. Checking a text then walks it a single time, so the
+cost is O(len(text)) however many terms there are. The module has no database imports on purpose, because
+moderation pool workers import it.
+"""
+import os
+from collections import deque
+from typing import Iterable
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class TermMatcher:
+    """Finds whole-word, case-insensitive occurrences of any of ``terms``.
+
+    Terms may be phrases. A term edge that is a letter or digit only matches at a word boundary, so "ass" does not
+    block "class".
+    """
+
+    def __init__(self, terms: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Per state: (length, needs boundary before, needs boundary after) of every term ending there.
+        self._out: list[tuple[tuple[int, bool, bool], ...]] = [()]
+        self.size = 0
+        for term in terms:
+            self._add(" ".join(term.casefold().split()))
+        self._link()
+
+    def _add(self, term: str):
+        if not term:
+            return
+        state = 0
+        for char in term:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = following
+        output = (len(term), _is_word(term[0]), _is_word(term[-1]))
+        if output not in self._out[state]:
+            self._out[state] += (output,)
+            self.size += 1
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] += self._out[self._fail[following]]
+
+    def matches(self, text: str) -> bool:
+        if not self.size or not text:
+            return False
+        # Whitespace is collapsed as in the terms, so "bad\n\tword" still matches the phrase "bad word".
+        text = " ".join(text.casefold().split())
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, boundary_before, boundary_after in out[state]:
+                start = end - length + 1
+                if boundary_before and start > 0 and _is_word(text[start - 1]):
+                    continue
+                if boundary_after and end + 1 < len(text) and _is_word(text[end + 1]):
+                    continue
+                return True
+        return False
+
+
+def read_terms(path: str) -> list[str]:
+    """One term or phrase per line; blank lines and lines starting with ``#`` are skipped."""
+    with open(path, encoding="utf-8") as terms_file:
+        return [line.strip() for line in terms_file if line.strip() and not line.lstrip().startswith("#")]
+
+
+_loaded: dict[str, tuple[tuple[int, int], TermMatcher]] = {}
+
+
+def load_matcher(path: str) -> TermMatcher:
+    """The matcher for ``path``, rebuilt whenever the file's modification time or size changes."""
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _loaded.get(path)
+    if cached is None or cached[0] != version:
+        cached = _loaded[path] = (version, TermMatcher(read_terms(path)))
+    return cached[1]
+
+
+def check(path: str, texts: list[str]) -> list[bool]:
+    matcher = load_matcher(path)
+    return [matcher.matches(text) for text in texts]